@@ -0,0 +1,190 @@
+"""Экспорт и импорт всего архива пользователя (доски, элементы, метаданные файлов).
+
+Формат — NDJSON: заголовок, затем доски, затем элементы, по записи в строке. ZIP — тот же NDJSON,
+сжатый в один файл archive.ndjson. Экспорт читает строки курсором (yield_per) и отдаёт их по мере
+чтения, импорт пишет пачками по IMPORT_BATCH_SIZE: память не зависит от размера архива
+(в памяти держится только соответствие старых id досок новым).
+
+    python -m app.archive export 123456789 --format zip --output archive.zip
+    python -m app.archive import 123456789 archive.zip
+"""
+import argparse
+import asyncio
+import io
+import json
+import sys
+import zipfile
+from datetime import datetime, timezone
+from pydantic import ValidationError
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from . import crud, models, schemas
+
+ARCHIVE_VERSION = 1
+ARCHIVE_MEMBER = "archive.ndjson"
+EXPORT_BATCH_SIZE = 1000
+IMPORT_BATCH_SIZE = 500
+
+class ArchiveError(ValueError):
+    pass
+
+def _line(record) -> bytes:
+    return json.dumps(record, ensure_ascii=False, separators=(",", ":")).encode() + b"\n"
+
+async def export_records(db: AsyncSession, user_id: int, telegram_id: int):
+    yield {"type": "archive", "version": ARCHIVE_VERSION, "telegram_id": telegram_id, "exported_at": datetime.now(timezone.utc).isoformat()}
+    # Колонки, а не ORM-объекты: строки не задерживаются в identity map сессии.
+    boards = select(models.Board.id, models.Board.name, models.Board.emoji_icon).where(models.Board.owner_id == user_id).order_by(models.Board.id)
+    async for row in await db.stream(boards.execution_options(yield_per=EXPORT_BATCH_SIZE)):
+        yield {"type": "board", "id": row.id, "name": row.name, "emoji_icon": row.emoji_icon}
+    items = (select(models.Item.id, models.Item.board_id, models.Item.item_type, models.Item.title, models.Item.content,
+                    models.Media.file_unique_id, models.Media.file_size, models.Media.duration, models.Media.mime_type)
+             .outerjoin(models.Media, models.Media.id == models.Item.media_id)
+             .where(models.Item.owner_id == user_id).order_by(models.Item.id))
+    async for row in await db.stream(items.execution_options(yield_per=EXPORT_BATCH_SIZE)):
+        media = {"file_unique_id": row.file_unique_id, "file_size": row.file_size, "duration": row.duration, "mime_type": row.mime_type} if row.file_unique_id else None
+        yield {"type": "item", "id": row.id, "board_id": row.board_id, "item_type": row.item_type, "title": row.title, "content": row.content, "media": media}
+
+async def export_ndjson(db: AsyncSession, user_id: int, telegram_id: int):
+    async for record in export_records(db, user_id, telegram_id):
+        yield _line(record)
+
+class _ChunkSink(io.RawIOBase):
+    """Файл только на запись для ZipFile: накопленное забирается `drain()` после каждой записи."""
+
+    def __init__(self):
+        self._chunks = []
+
+    def writable(self): return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self) -> bytes:
+        data, self._chunks = b"".join(self._chunks), []
+        return data
+
+async def export_zip(db: AsyncSession, user_id: int, telegram_id: int):
+    # ZipFile пишет в неперематываемый поток с дескрипторами данных после каждого файла,
+    # поэтому архив отдаётся кусками, не собираясь целиком ни в памяти, ни на диске.
+    sink = _ChunkSink()
+    with zipfile.ZipFile(sink, mode="w", compression=zipfile.ZIP_DEFLATED) as archive:
+        with archive.open(ARCHIVE_MEMBER, mode="w", force_zip64=True) as member:
+            async for line in export_ndjson(db, user_id, telegram_id):
+                member.write(line)
+                chunk = sink.drain()
+                if chunk: yield chunk
+    yield sink.drain()
+
+EXPORTERS = {"ndjson": (export_ndjson, "application/x-ndjson"), "zip": (export_zip, "application/zip")}
+
+async def iter_lines(chunks):
+    """Строки из асинхронного потока байтов (тело запроса, файл)."""
+    tail = b""
+    async for chunk in chunks:
+        lines = (tail + chunk).split(b"\n")
+        tail = lines.pop()
+        for line in lines:
+            if line.strip(): yield line
+    if tail.strip(): yield tail
+
+async def iter_zip_lines(file):
+    # Оглавление ZIP лежит в конце, поэтому архив читается из файла (см. SpooledTemporaryFile в API).
+    try:
+        with zipfile.ZipFile(file) as archive, archive.open(ARCHIVE_MEMBER) as member:
+            for line in member:
+                if line.strip(): yield line
+    except (zipfile.BadZipFile, KeyError) as e: raise ArchiveError(f"Invalid zip archive: {e}") from e
+
+async def import_records(db: AsyncSession, user_id: int, lines, batch_size: int = IMPORT_BATCH_SIZE):
+    """Импортирует архив в аккаунт user_id одной транзакцией; доски создаются заново, элементы переносятся на них."""
+    board_ids, boards, items = {}, [], []
+    counts = {"boards": 0, "items": 0}
+
+    async def flush_boards():
+        if not boards: return
+        # id возвращаются в порядке строк архива (см. crud.insert_in_order)
+        new_ids = await crud.insert_in_order(db, models.Board, [{k: v for k, v in board.items() if k != "id"} for board in boards], models.Board.id)
+        board_ids.update(zip((board["id"] for board in boards), new_ids))
+        counts["boards"] += len(boards)
+        boards.clear()
+
+    async def flush_items():
+        if not items: return
+        media_ids = await crud.upsert_media(db, [item for _, item in items if item.media])
+        rows = [{**item.dict(exclude={"media", "board_id"}), "owner_id": user_id, "board_id": board_ids.get(old_board_id),
+                 "media_id": media_ids.get(item.media.file_unique_id) if item.media else None} for old_board_id, item in items]
+        # Core-вставка без RETURNING: ORM-объекты не создаются и не копятся в сессии
+        await db.execute(insert(models.Item.__table__), rows)
+        counts["items"] += len(items)
+        items.clear()
+
+    header_seen = False
+    async for line in lines:
+        try: record = json.loads(line)
+        except ValueError as e: raise ArchiveError(f"Invalid archive line: {e}") from e
+        if not isinstance(record, dict): raise ArchiveError("Invalid archive line: expected a JSON object")
+        kind = record.get("type")
+        if not header_seen:
+            if kind != "archive" or record.get("version") != ARCHIVE_VERSION: raise ArchiveError("Unsupported archive format")
+            header_seen = True
+        elif kind == "board":
+            try: board = schemas.ArchiveBoard.model_validate(record)
+            except ValidationError as e: raise ArchiveError(f"Invalid board {record.get('id')}: {e}") from e
+            boards.append({**board.model_dump(), "owner_id": user_id})
+            if len(boards) >= batch_size: await flush_boards()
+        elif kind == "item":
+            # Доски в архиве идут раньше элементов: к первому элементу все доски уже вставлены
+            await flush_boards()
+            try: item = schemas.ArchiveItem.model_validate(record)
+            except ValidationError as e: raise ArchiveError(f"Invalid item {record.get('id')}: {e}") from e
+            items.append((item.board_id, item))
+            if len(items) >= batch_size: await flush_items()
+    if not header_seen: raise ArchiveError("Empty archive")
+    await flush_boards()
+    await flush_items()
+    if counts["boards"]: await crud.bump_boards_version(db, user_id)
+    await db.commit()
+    return counts
+
+async def _run_cli(args):
+    from .database import AsyncSessionLocal
+    async with AsyncSessionLocal() as db:
+        user_id = await crud.get_user_id_by_telegram_id(db, args.telegram_id)
+        if args.command == "export":
+            if user_id is None: sys.exit(f"User {args.telegram_id} not found")
+            exporter, _ = EXPORTERS[args.format]
+            output = open(args.output, "wb") if args.output else sys.stdout.buffer
+            try:
+                async for chunk in exporter(db, user_id, args.telegram_id): output.write(chunk)
+            finally:
+                if args.output: output.close()
+            return
+        # Перенос на новый инстанс: пользователя может ещё не быть
+        if user_id is None: user_id = (await crud.create_user(db, schemas.UserCreate(telegram_id=args.telegram_id))).id
+        with open(args.path, "rb") as file:
+            is_zip = zipfile.is_zipfile(file)
+            file.seek(0)
+            lines = iter_zip_lines(file) if is_zip else iter_lines(_file_chunks(file))
+            counts = await import_records(db, user_id, lines)
+        print(json.dumps(counts))
+
+async def _file_chunks(file, size: int = 1 << 16):
+    while chunk := file.read(size): yield chunk
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+    export = commands.add_parser("export")
+    export.add_argument("telegram_id", type=int)
+    export.add_argument("--format", choices=EXPORTERS, default="ndjson")
+    export.add_argument("--output", help="по умолчанию — stdout")
+    load = commands.add_parser("import")
+    load.add_argument("telegram_id", type=int)
+    load.add_argument("path", help="NDJSON или ZIP, созданный командой export")
+    asyncio.run(_run_cli(parser.parse_args()))
+
+if __name__ == "__main__":
+    main()
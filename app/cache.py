@@ -0,0 +1,93 @@
+import os
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Optional
+
+class UserIdCache(ABC):
+    """Кэш соответствия telegram_id -> users.id.
+
+    Соответствие не меняется после создания пользователя, поэтому кэшируется без сброса по записи;
+    промахи (пользователя ещё нет) не кэшируются.
+    """
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+
+    async def get(self, telegram_id: int) -> Optional[int]:
+        user_id = await self._get(telegram_id)
+        if user_id is None: self.misses += 1
+        else: self.hits += 1
+        return user_id
+
+    @abstractmethod
+    async def set(self, telegram_id: int, user_id: int): ...
+    @abstractmethod
+    async def delete(self, telegram_id: int): ...
+    @abstractmethod
+    async def _get(self, telegram_id: int) -> Optional[int]: ...
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {"backend": type(self).__name__, "hits": self.hits, "misses": self.misses, "hit_ratio": self.hits / total if total else 0.0}
+
+class LocalUserIdCache(UserIdCache):
+    """LRU в памяти процесса с ограничением по размеру и TTL."""
+
+    def __init__(self, maxsize: int = 10000, ttl: float = 3600):
+        super().__init__()
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+
+    async def _get(self, telegram_id):
+        entry = self._entries.get(telegram_id)
+        if entry is None: return None
+        user_id, expires_at = entry
+        if expires_at < time.monotonic():
+            del self._entries[telegram_id]
+            return None
+        self._entries.move_to_end(telegram_id)
+        return user_id
+
+    async def set(self, telegram_id, user_id):
+        self._entries[telegram_id] = (user_id, time.monotonic() + self.ttl)
+        self._entries.move_to_end(telegram_id)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    async def delete(self, telegram_id):
+        self._entries.pop(telegram_id, None)
+
+    def stats(self):
+        return {**super().stats(), "size": len(self._entries), "maxsize": self.maxsize}
+
+class RedisUserIdCache(UserIdCache):
+    """Общий для всех воркеров кэш в Redis-совместимом хранилище (redis.asyncio, fakeredis)."""
+
+    def __init__(self, client, ttl: float = 3600, prefix: str = "user_id:"):
+        super().__init__()
+        self.client = client
+        self.ttl = ttl
+        self.prefix = prefix
+
+    async def _get(self, telegram_id):
+        value = await self.client.get(f"{self.prefix}{telegram_id}")
+        return int(value) if value is not None else None
+
+    async def set(self, telegram_id, user_id):
+        await self.client.set(f"{self.prefix}{telegram_id}", user_id, ex=int(self.ttl))
+
+    async def delete(self, telegram_id):
+        await self.client.delete(f"{self.prefix}{telegram_id}")
+
+def create_user_id_cache() -> UserIdCache:
+    ttl = float(os.getenv("USER_CACHE_TTL", "3600"))
+    redis_url = os.getenv("USER_CACHE_REDIS_URL")
+    if redis_url:
+        import redis.asyncio as redis
+        return RedisUserIdCache(redis.from_url(redis_url), ttl=ttl)
+    return LocalUserIdCache(maxsize=int(os.getenv("USER_CACHE_SIZE", "10000")), ttl=ttl)
+
+user_id_cache = create_user_id_cache()
@@ -1,52 +1,205 @@
-from sqlalchemy.orm import Session
-from . import models, schemas
+from sqlalchemy import and_, delete, func, insert, or_, select, update
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import selectinload
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlalchemy.ext.asyncio import AsyncSession
+from . import models, schemas, search
+from .cache import user_id_cache
 
-def get_user_by_telegram_id(db: Session, telegram_id: int):
-    return db.query(models.User).filter(models.User.telegram_id == telegram_id).first()
-def create_user(db: Session, user: schemas.UserCreate):
+UPSERTS = {"postgresql": postgresql_insert, "sqlite": sqlite_insert}
+
+async def get_user_by_telegram_id(db: AsyncSession, telegram_id: int, with_boards: bool = False):
+    query = select(models.User).where(models.User.telegram_id == telegram_id).limit(1)
+    if with_boards: query = query.options(selectinload(models.User.boards))
+    return await db.scalar(query)
+async def get_user_id_by_telegram_id(db: AsyncSession, telegram_id: int):
+    user_id = await user_id_cache.get(telegram_id)
+    if user_id is None:
+        user_id = await db.scalar(select(models.User.id).where(models.User.telegram_id == telegram_id).limit(1))
+        if user_id is not None: await user_id_cache.set(telegram_id, user_id)
+    return user_id
+async def create_user(db: AsyncSession, user: schemas.UserCreate):
     db_user = models.User(telegram_id=user.telegram_id, username=user.username)
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await db.commit()
+    await db.refresh(db_user)
+    set_committed_value(db_user, "boards", [])
+    await user_id_cache.set(db_user.telegram_id, db_user.id)
     return db_user
 
-def get_board_by_id(db: Session, board_id: int):
-    return db.query(models.Board).filter(models.Board.id == board_id).first()
-def get_boards_by_user(db: Session, user_id: int):
-    return db.query(models.Board).filter(models.Board.owner_id == user_id).all()
-def create_user_board(db: Session, board: schemas.BoardCreate, user_id: int):
+async def insert_in_order(db: AsyncSession, model, rows, returning=None):
+    # RETURNING в порядке rows. В PostgreSQL — sort_by_parameter_order (один INSERT … SELECT с сортировкой);
+    # SQLite так пакетировать не умеет и вставлял бы по строке, но id одного INSERT в нём растут в порядке VALUES.
+    returning = model if returning is None else returning
+    if db.bind.dialect.name == "sqlite":
+        result = (await db.scalars(insert(model).returning(returning), rows)).all()
+        return sorted(result, key=lambda row: row.id if isinstance(row, model) else row)
+    return (await db.scalars(insert(model).returning(returning, sort_by_parameter_order=True), rows)).all()
+
+async def bump_boards_version(db: AsyncSession, user_id: int):
+    await db.execute(update(models.User).where(models.User.id == user_id).values(boards_version=models.User.boards_version + 1))
+async def bump_board_versions(db: AsyncSession, board_ids):
+    board_ids = {board_id for board_id in board_ids if board_id is not None}
+    if board_ids: await db.execute(update(models.Board).where(models.Board.id.in_(board_ids)).values(version=models.Board.version + 1))
+async def get_boards_version(db: AsyncSession, user_id: int):
+    return await db.scalar(select(models.User.boards_version).where(models.User.id == user_id))
+async def get_board_version(db: AsyncSession, board_id: int):
+    return await db.scalar(select(models.Board.version).where(models.Board.id == board_id))
+
+async def get_board_by_id(db: AsyncSession, board_id: int):
+    return await db.scalar(select(models.Board).where(models.Board.id == board_id).limit(1))
+async def get_boards_by_user(db: AsyncSession, user_id: int):
+    return (await db.scalars(select(models.Board).where(models.Board.owner_id == user_id))).all()
+async def create_user_board(db: AsyncSession, board: schemas.BoardCreate, user_id: int):
     db_board = models.Board(**board.dict(), owner_id=user_id)
     db.add(db_board)
-    db.commit()
-    db.refresh(db_board)
+    await bump_boards_version(db, user_id)
+    await db.commit()
+    await db.refresh(db_board)
     return db_board
-def delete_board(db: Session, board: models.Board):
-    for item in board.items:
-        item.board_id = None
-    db.delete(board)
-    db.commit()
+async def delete_board(db: AsyncSession, board: models.Board):
+    await db.execute(update(models.Item).where(models.Item.board_id == board.id).values(board_id=None))
+    await db.execute(delete(models.Board).where(models.Board.id == board.id))
+    await bump_boards_version(db, board.owner_id)
+    await db.commit()
 
-def get_item_by_id(db: Session, item_id: int):
-    return db.query(models.Item).filter(models.Item.id == item_id).first()
-def create_user_item(db: Session, item: schemas.ItemCreate, user_id: int):
-    db_item = models.Item(**item.dict(), owner_id=user_id)
+async def get_item_by_id(db: AsyncSession, item_id: int):
+    return await db.scalar(select(models.Item).where(models.Item.id == item_id).limit(1))
+async def upsert_media(db: AsyncSession, items):
+    # Один INSERT ... ON CONFLICT на все файлы; file_id обновляем на последний присланный.
+    rows = {}
+    for item in items:
+        rows[item.media.file_unique_id] = {**item.media.dict(), "media_type": item.item_type, "file_id": item.content}
+    if not rows: return {}
+    statement = UPSERTS[db.bind.dialect.name](models.Media).values(list(rows.values()))
+    statement = statement.on_conflict_do_update(index_elements=[models.Media.file_unique_id], set_={"file_id": statement.excluded.file_id})
+    result = await db.execute(statement.returning(models.Media.file_unique_id, models.Media.id))
+    return dict(result.all())
+async def get_items_by_media(db: AsyncSession, user_id: int, file_unique_ids):
+    # Первый сохранённый элемент пользователя для каждого файла (индекс items(owner_id, media_id)).
+    if not file_unique_ids: return {}
+    query = (select(models.Media.file_unique_id, models.Item)
+             .join(models.Item, models.Item.media_id == models.Media.id)
+             .where(models.Media.file_unique_id.in_(file_unique_ids), models.Item.owner_id == user_id)
+             .order_by(models.Item.id))
+    found = {}
+    for file_unique_id, item in (await db.execute(query)).all(): found.setdefault(file_unique_id, item)
+    return found
+async def create_user_item(db: AsyncSession, item: schemas.ItemCreate, user_id: int, on_duplicate: str = "link"):
+    # Возвращает (элемент, duplicate). on_duplicate="skip": если файл уже сохранён, новый элемент не создаётся.
+    if item.media and on_duplicate == "skip":
+        existing = (await get_items_by_media(db, user_id, [item.media.file_unique_id])).get(item.media.file_unique_id)
+        if existing: return existing, True
+    media_ids = await upsert_media(db, [item] if item.media else [])
+    db_item = models.Item(**item.dict(exclude={"media"}), owner_id=user_id, media_id=media_ids.get(item.media.file_unique_id) if item.media else None)
     db.add(db_item)
-    db.commit()
-    db.refresh(db_item)
-    return db_item
-def get_items_by_board(db: Session, board_id: int):
-    return db.query(models.Item).filter(models.Item.board_id == board_id).all()
-def move_item_to_board(db: Session, item: models.Item, board_id: int):
+    await db.commit()
+    await db.refresh(db_item)
+    return db_item, False
+async def create_user_items(db: AsyncSession, items, user_id: int, board_id: int = None, on_duplicate: str = "link"):
+    # Один многострочный INSERT ... RETURNING в одной транзакции вместо коммита на каждый элемент.
+    # При on_duplicate="skip" вместо уже сохранённых файлов возвращаются существующие элементы,
+    # а повтор файла внутри запроса — тот же новый элемент, что и первое вхождение.
+    existing = {}
+    if on_duplicate == "skip": existing = await get_items_by_media(db, user_id, {item.media.file_unique_id for item in items if item.media})
+    new_items, first_new, order = [], {}, []
+    for item in items:
+        file_unique_id = item.media.file_unique_id if item.media and on_duplicate == "skip" else None
+        if file_unique_id in existing: order.append(existing[file_unique_id]); continue
+        if file_unique_id in first_new: order.append(first_new[file_unique_id]); continue
+        if file_unique_id is not None: first_new[file_unique_id] = len(new_items)
+        order.append(len(new_items))
+        new_items.append(item)
+    media_ids = await upsert_media(db, [item for item in new_items if item.media])
+    rows = [{**item.dict(exclude={"media"}), "owner_id": user_id, "board_id": board_id, "media_id": media_ids.get(item.media.file_unique_id) if item.media else None} for item in new_items]
+    inserted = await insert_in_order(db, models.Item, rows) if rows else []
+    if rows:
+        await bump_board_versions(db, [board_id])
+        await db.commit()
+    # В order — индекс в new_items для новых элементов или сам существующий элемент
+    return [inserted[entry] if isinstance(entry, int) else entry for entry in order]
+async def get_storage_usage(db: AsyncSession, user_id: int):
+    # Размер считается по уникальным файлам: один файл, сохранённый дважды, места дважды не занимает.
+    by_type = {}
+    items_query = select(models.Item.item_type, func.count()).where(models.Item.owner_id == user_id).group_by(models.Item.item_type)
+    for item_type, count in (await db.execute(items_query)).all():
+        by_type[item_type] = {"items": count, "unique_media": 0, "bytes": 0}
+    media_ids = select(models.Item.media_id).where(models.Item.owner_id == user_id, models.Item.media_id.is_not(None))
+    media_query = (select(models.Media.media_type, func.count(), func.coalesce(func.sum(models.Media.file_size), 0))
+                   .where(models.Media.id.in_(media_ids)).group_by(models.Media.media_type))
+    for media_type, count, size in (await db.execute(media_query)).all():
+        usage = by_type.setdefault(media_type, {"items": 0, "unique_media": 0, "bytes": 0})
+        usage["unique_media"], usage["bytes"] = count, int(size)
+    return {
+        "items": sum(usage["items"] for usage in by_type.values()),
+        "unique_media": sum(usage["unique_media"] for usage in by_type.values()),
+        "bytes": sum(usage["bytes"] for usage in by_type.values()),
+        "by_type": by_type,
+    }
+async def get_items_by_board(db: AsyncSession, board_id: int):
+    return (await db.scalars(select(models.Item).where(models.Item.board_id == board_id))).all()
+def _page_cursors(rows, limit: int, after: int = None, before: int = None):
+    # rows выбраны с запасом в один элемент (limit + 1): по нему видно, есть ли следующая страница.
+    has_more = len(rows) > limit
+    if before is not None:
+        items = list(reversed(rows[:limit]))
+        return items, items[-1].id if items else None, items[0].id if has_more else None
+    items = rows[:limit]
+    return items, items[-1].id if has_more else None, items[0].id if after is not None and items else None
+async def get_items_page(db: AsyncSession, board_id: int, limit: int, after: int = None, before: int = None):
+    # Keyset-пагинация по (board_id, id): курсор — id крайнего элемента страницы.
+    query = select(models.Item).where(models.Item.board_id == board_id)
+    if before is not None: query = query.where(models.Item.id < before).order_by(models.Item.id.desc())
+    else:
+        if after is not None: query = query.where(models.Item.id > after)
+        query = query.order_by(models.Item.id)
+    rows = (await db.scalars(query.limit(limit + 1))).all()
+    return _page_cursors(rows, limit, after, before)
+async def get_board_page(db: AsyncSession, board_id: int, limit: int, after: int = None, before: int = None):
+    # Доска и страница её элементов одним запросом: LEFT JOIN, чтобы пустая доска тоже нашлась.
+    join_on = [models.Item.board_id == models.Board.id]
+    if before is not None: join_on.append(models.Item.id < before)
+    elif after is not None: join_on.append(models.Item.id > after)
+    order = models.Item.id.desc() if before is not None else models.Item.id
+    query = select(models.Board, models.Item).outerjoin(models.Item, and_(*join_on)).where(models.Board.id == board_id).order_by(order).limit(limit + 1)
+    rows = (await db.execute(query)).all()
+    if not rows: return None
+    items, next_cursor, prev_cursor = _page_cursors([item for _, item in rows if item is not None], limit, after, before)
+    return rows[0][0], items, next_cursor, prev_cursor
+async def iter_items_by_board(db: AsyncSession, board_id: int, batch_size: int = 500):
+    after = 0
+    while True:
+        query = select(models.Item).where(models.Item.board_id == board_id, models.Item.id > after).order_by(models.Item.id).limit(batch_size)
+        batch = (await db.scalars(query)).all()
+        if not batch: return
+        for item in batch: yield item
+        after = batch[-1].id
+async def move_item_to_board(db: AsyncSession, item: models.Item, board_id: int):
+    await bump_board_versions(db, [item.board_id, board_id])
     item.board_id = board_id
-    db.commit()
-    db.refresh(item)
+    await db.commit()
+    await db.refresh(item)
     return item
-def search_items_by_title(db: Session, user_id: int, query: str):
-    return db.query(models.Item).filter(models.Item.owner_id == user_id, models.Item.title.ilike(f"%{query}%")).all()
-def delete_item_by_id(db: Session, item_id: int):
-    db_item = get_item_by_id(db, item_id=item_id)
+async def move_items_to_board(db: AsyncSession, item_ids, board_id: int):
+    source_boards = select(models.Item.board_id).where(models.Item.id.in_(item_ids)).scalar_subquery()
+    await db.execute(update(models.Board).where(or_(models.Board.id.in_(source_boards), models.Board.id == board_id)).values(version=models.Board.version + 1))
+    result = await db.execute(update(models.Item).where(models.Item.id.in_(item_ids)).values(board_id=board_id))
+    await db.commit()
+    return result.rowcount
+async def search_items(db: AsyncSession, user_id: int, query: str, limit: int = 20):
+    return await search.search_items(db, user_id=user_id, query=query, limit=limit)
+async def delete_items(db: AsyncSession, item_ids):
+    source_boards = select(models.Item.board_id).where(models.Item.id.in_(item_ids)).scalar_subquery()
+    await db.execute(update(models.Board).where(models.Board.id.in_(source_boards)).values(version=models.Board.version + 1))
+    result = await db.execute(delete(models.Item).where(models.Item.id.in_(item_ids)))
+    await db.commit()
+    return result.rowcount
+async def delete_item_by_id(db: AsyncSession, item_id: int):
+    db_item = await get_item_by_id(db, item_id=item_id)
     if db_item:
-        db.delete(db_item)
-        db.commit()
+        await bump_board_versions(db, [db_item.board_id])
+        await db.delete(db_item)
+        await db.commit()
         return True
-    return False
\ No newline at end of file
+    return False
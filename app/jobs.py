@@ -0,0 +1,186 @@
+"""Фоновые задачи API: очередь в таблице jobs и пул asyncio-исполнителей в том же процессе.
+
+Задача ставится `queue.enqueue(db, kind, payload)`, исполнитель забирает её одним UPDATE … RETURNING
+(в PostgreSQL — с FOR UPDATE SKIP LOCKED), поэтому несколько процессов API делят одну очередь.
+Взятая задача арендуется на `lease` секунд и продлевается, пока работает; если процесс упал,
+аренда истекает и задачу забирает другой исполнитель. Ошибка — повтор с экспоненциальной
+отсрочкой, пока не исчерпано max_attempts; у каждого вида задач может быть свой лимит параллельности.
+
+Экспорт архива пишет файл в JOB_EXPORT_DIR, а скачать его может любой процесс API. Если API запущен
+на нескольких хостах (API_INSTANCES > 1), JOB_EXPORT_DIR обязателен и должен быть общим для всех
+(сетевой диск, общий том); без него временный каталог есть только у хоста, выполнившего задачу.
+"""
+import asyncio
+import logging
+import os
+import socket
+import tempfile
+import time
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import and_, or_, select, update
+
+from . import archive, crud, models, search
+from .database import AsyncSessionLocal
+from .metrics import REGISTRY
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+EXPORT_DIR = os.getenv("JOB_EXPORT_DIR") or os.path.join(tempfile.gettempdir(), "izbranoe-exports")
+EXPORT_DIR_SHARED = bool(os.getenv("JOB_EXPORT_DIR"))
+
+JOB_SECONDS = REGISTRY.histogram("job_duration_seconds", "Время выполнения фоновой задачи (одна попытка)", ("kind", "outcome"))
+
+def _now():
+    return datetime.now(timezone.utc)
+
+class JobQueue:
+    def __init__(self, session_factory=AsyncSessionLocal, lease: float = 300, poll_interval: float = 1.0, retry_backoff: float = 5.0):
+        self.session_factory = session_factory
+        self.lease = lease
+        self.poll_interval = poll_interval
+        self.retry_backoff = retry_backoff
+        self._handlers = {}
+        self._running = Counter()
+        self._claim_lock = asyncio.Lock()
+        self._wakeup = asyncio.Event()
+        self._workers = []
+        self._stopping = False
+
+    def register(self, kind: str, concurrency: int = None):
+        """Декоратор обработчика `async def handler(db, job) -> result`; result сохраняется как JSON."""
+        def decorator(handler):
+            self._handlers[kind] = (handler, concurrency)
+            return handler
+        return decorator
+
+    async def enqueue(self, db, kind: str, payload: dict, max_attempts: int = 3) -> models.Job:
+        if kind not in self._handlers: raise ValueError(f"Unknown job kind: {kind}")
+        now = _now()
+        job = models.Job(kind=kind, payload=payload, status=QUEUED, attempts=0, max_attempts=max_attempts, run_after=now, created_at=now)
+        db.add(job)
+        await db.commit()
+        self._wakeup.set()
+        return job
+
+    def start(self, workers: int = 4):
+        self._stopping = False
+        self._workers = [asyncio.create_task(self._worker(), name=f"job-worker-{n}") for n in range(workers)]
+
+    async def stop(self, timeout: float = 30):
+        """Ждёт текущие задачи до timeout, затем отменяет; недоделанные вернутся в очередь по истечении аренды."""
+        self._stopping = True
+        self._wakeup.set()
+        if not self._workers: return
+        _, pending = await asyncio.wait(self._workers, timeout=timeout)
+        for task in pending: task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    async def _worker(self):
+        while not self._stopping:
+            # Событие сбрасывается до попытки взять задачу: enqueue между ними не потеряется
+            self._wakeup.clear()
+            try: job = await self._claim()
+            except Exception as e:
+                logging.error(f"Failed to claim a job: {e}")
+                job = None
+            if job is None:
+                try: await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+                except asyncio.TimeoutError: pass
+                continue
+            await self._run(job)
+
+    async def _claim(self):
+        async with self._claim_lock:
+            # Виды задач, упёршиеся в свой лимит параллельности, в этом процессе не берём
+            saturated = [kind for kind, (_, limit) in self._handlers.items() if limit is not None and self._running[kind] >= limit]
+            now = _now()
+            due = or_(and_(models.Job.status == QUEUED, models.Job.run_after <= now), and_(models.Job.status == RUNNING, models.Job.locked_until < now))
+            candidate = (select(models.Job.id).where(due, models.Job.kind.in_(self._handlers), models.Job.kind.not_in(saturated))
+                         .order_by(models.Job.id).limit(1).with_for_update(skip_locked=True).scalar_subquery())
+            stmt = (update(models.Job).where(models.Job.id == candidate)
+                    .values(status=RUNNING, attempts=models.Job.attempts + 1, locked_until=now + timedelta(seconds=self.lease))
+                    .returning(models.Job.id, models.Job.kind, models.Job.payload, models.Job.attempts, models.Job.max_attempts))
+            async with self.session_factory() as db:
+                job = (await db.execute(stmt)).first()
+                await db.commit()
+            if job is not None: self._running[job.kind] += 1
+            return job
+
+    async def _run(self, job):
+        handler, _ = self._handlers[job.kind]
+        heartbeat = asyncio.create_task(self._heartbeat(job.id))
+        started = time.perf_counter()
+        outcome = "ok"
+        try:
+            # Задача, чья аренда истекла на последней попытке (процесс упал), больше не запускается
+            if job.attempts > job.max_attempts: raise RuntimeError("Job lease expired on the last attempt")
+            async with self.session_factory() as db:
+                result = await handler(db, job)
+            await self._update(job.id, status=DONE, result=result, error=None, locked_until=None, finished_at=_now())
+        except Exception as e:
+            outcome = type(e).__name__
+            await self._fail(job, e)
+        finally:
+            heartbeat.cancel()
+            self._running[job.kind] -= 1
+            JOB_SECONDS.observe(time.perf_counter() - started, kind=job.kind, outcome=outcome)
+
+    async def _fail(self, job, error: Exception):
+        message = f"{type(error).__name__}: {error}"
+        if job.attempts >= job.max_attempts:
+            logging.error(f"Job {job.id} ({job.kind}) failed after {job.attempts} attempts: {message}")
+            await self._update(job.id, status=FAILED, error=message, locked_until=None, finished_at=_now())
+            return
+        delay = self.retry_backoff * 2 ** (job.attempts - 1)
+        logging.warning(f"Job {job.id} ({job.kind}) attempt {job.attempts} failed, retry in {delay:g}s: {message}")
+        await self._update(job.id, status=QUEUED, error=message, locked_until=None, run_after=_now() + timedelta(seconds=delay))
+
+    async def _heartbeat(self, job_id: int):
+        while True:
+            await asyncio.sleep(self.lease / 3)
+            try: await self._update(job_id, locked_until=_now() + timedelta(seconds=self.lease))
+            except Exception as e: logging.warning(f"Failed to extend lease of job {job_id}: {e}")
+
+    async def _update(self, job_id: int, **values):
+        async with self.session_factory() as db:
+            await db.execute(update(models.Job).where(models.Job.id == job_id).values(**values))
+            await db.commit()
+
+async def get_job(db, job_id: int):
+    return await db.get(models.Job, job_id)
+
+queue = JobQueue(lease=float(os.getenv("JOB_LEASE_SECONDS", "300")), poll_interval=float(os.getenv("JOB_POLL_INTERVAL", "1")),
+                 retry_backoff=float(os.getenv("JOB_RETRY_BACKOFF", "5")))
+
+@queue.register("delete_items")
+async def delete_items_job(db, job):
+    return {"deleted": await crud.delete_items(db, item_ids=job.payload["item_ids"])}
+
+@queue.register("move_items")
+async def move_items_job(db, job):
+    return {"moved": await crud.move_items_to_board(db, item_ids=job.payload["item_ids"], board_id=job.payload["board_id"])}
+
+@queue.register("delete_board")
+async def delete_board_job(db, job):
+    board = await crud.get_board_by_id(db, board_id=job.payload["board_id"])
+    if board is None: return {"deleted": False}
+    await crud.delete_board(db=db, board=board)
+    return {"deleted": True}
+
+@queue.register("export_archive", concurrency=int(os.getenv("JOB_EXPORT_CONCURRENCY", "2")))
+async def export_archive_job(db, job):
+    exporter, media_type = archive.EXPORTERS[job.payload["format"]]
+    os.makedirs(EXPORT_DIR, exist_ok=True)
+    path = os.path.join(EXPORT_DIR, f"job-{job.id}.{job.payload['format']}")
+    size = 0
+    with open(path, "wb") as file:
+        async for chunk in exporter(db, job.payload["user_id"], job.payload["telegram_id"]):
+            file.write(chunk)
+            size += len(chunk)
+    return {"path": path, "host": socket.gethostname(), "size": size, "media_type": media_type, "filename": f"archive-{job.payload['telegram_id']}.{job.payload['format']}"}
+
+@queue.register("rebuild_search_index", concurrency=1)
+async def rebuild_search_index_job(db, job):
+    await search.rebuild_index(db)
+    return {"ok": True}
@@ -1,40 +1,151 @@
+import asyncio
 import os
 import logging
-from fastapi import FastAPI, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
-from typing import List
+import signal
+import socket
+import tempfile
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Depends, HTTPException, Query, Request, Response
+from pydantic import TypeAdapter
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Literal, Optional
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import FileResponse, PlainTextResponse, StreamingResponse
 from aiogram import Bot
 from aiogram.exceptions import TelegramBadRequest
 from dotenv import load_dotenv
 
-from . import crud, models, schemas
-from .database import engine, get_db
+from . import archive, crud, jobs, metrics, schemas
+from .cache import user_id_cache
+from .database import AsyncSessionLocal, async_engine, get_db, warm_pool
+from .response_cache import ResponseCache
+from .telegram_files import FileUrlResolver, create_file_path_cache
 
 load_dotenv()
-models.Base.metadata.create_all(bind=engine)
-app = FastAPI(title="Izbranoe Pro API")
 
+# Схема БД создаётся не здесь, а разовой командой `python -m app.server migrate` (alembic upgrade head).
+# При импорте ничего не подключается к БД и Telegram: с gunicorn --preload модуль импортируется
+# один раз в мастере, а пул соединений, Bot и воркеры задач поднимаются в каждом воркере в lifespan.
 bot_token = os.getenv("BOT_TOKEN")
-bot = Bot(token=bot_token) if bot_token else None
+bot = None
+file_resolver = None
+# При нескольких воркерах /metrics отдаёт сумму по всем (METRICS_DIR задаёт app.server); создаётся в воркере
+shared_metrics = None
 
+def get_bot():
+    """Bot и FileUrlResolver процесса; без lifespan (ASGI-клиент в тестах) создаются при первом обращении."""
+    global bot, file_resolver
+    if bot is None and bot_token:
+        bot = Bot(token=bot_token)
+        bot.session.middleware(metrics.TelegramTimingMiddleware())
+        file_resolver = FileUrlResolver(bot, cache=create_file_path_cache(), max_concurrency=int(os.getenv("TELEGRAM_FILE_CONCURRENCY", "8")))
+    return bot
+
+async def warm_telegram():
+    # Открывает keep-alive соединение с api.telegram.org до первого запроса; недоступность Telegram старт не ломает
+    try: await asyncio.wait_for(bot.get_me(), timeout=5)
+    except Exception as e: logging.warning(f"Telegram warmup failed: {e}")
+
+def install_drain_hook(app: FastAPI, delay: float):
+    """Перехватывает SIGTERM у сервера: сначала /health отвечает 503, и только через delay секунд
+    сигнал передаётся серверу (тот закрывает сокет и дожидается текущих запросов).
+
+    За это время балансировщик выводит воркер из ротации, и при выкладке новые запросы не попадают
+    в останавливающийся процесс. uvicorn (и его воркер для gunicorn) ставит свой обработчик SIGTERM
+    до старта lifespan; если обработчика нет (ASGI-клиент в боте и бенчмарках), ничего не делаем.
+    """
+    previous = signal.getsignal(signal.SIGTERM)
+    if not callable(previous) or delay <= 0: return
+    loop = asyncio.get_running_loop()
+    def on_sigterm(signum, frame):
+        # Повторный SIGTERM — останавливаемся сразу
+        if not app.state.ready: return previous(signum, frame)
+        app.state.ready = False
+        logging.info(f"SIGTERM: not ready, stopping in {delay:g}s")
+        loop.call_soon_threadsafe(loop.call_later, delay, previous, signum, frame)
+    signal.signal(signal.SIGTERM, on_sigterm)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global shared_metrics
+    metrics_writer = None
+    if os.getenv("METRICS_DIR"):
+        shared_metrics = metrics.SharedMetricsDir(metrics.REGISTRY, os.environ["METRICS_DIR"])
+        metrics_writer = asyncio.create_task(shared_metrics.run())
+    await warm_pool(async_engine, int(os.getenv("DB_POOL_WARM", "4")))
+    if get_bot() and os.getenv("TELEGRAM_WARMUP", "1") == "1": await warm_telegram()
+    jobs.queue.start(workers=int(os.getenv("JOB_WORKERS", "4")))
+    app.state.ready = True
+    install_drain_hook(app, float(os.getenv("API_DRAIN_DELAY", "5")))
+    yield
+    # Сервер уже не принимает соединения и дождался текущих запросов; доделываем задачи и закрываем клиентов
+    app.state.ready = False
+    await jobs.queue.stop(timeout=float(os.getenv("JOB_DRAIN_TIMEOUT", "30")))
+    if bot: await bot.session.close()
+    await async_engine.dispose()
+    if metrics_writer:
+        metrics_writer.cancel()
+        shared_metrics.write()
+
+app = FastAPI(title="Izbranoe Pro API", lifespan=lifespan)
+app.state.ready = False
+
+response_cache = ResponseCache(maxsize=int(os.getenv("RESPONSE_CACHE_SIZE", "2048")))
+BOARDS_ADAPTER = TypeAdapter(List[schemas.Board])
+IMPORT_SPOOL_SIZE = 8 * 1024 * 1024
+
+def etag_matches(request: Request, etag: str):
+    header = request.headers.get("if-none-match")
+    if not header: return False
+    return header.strip() == "*" or etag in (tag.strip() for tag in header.split(","))
+
+async def cached_json_response(request: Request, etag: str, build):
+    # ETag строится из счётчика версий в БД: совпал — отдаём 304 без запроса данных,
+    # иначе берём готовое тело из кэша или собираем его через build().
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag_matches(request, etag): return Response(status_code=304, headers=headers)
+    key = (request.url.path, request.url.query, etag)
+    body = response_cache.get(key)
+    if body is None:
+        body = await build()
+        response_cache.set(key, body)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+metrics.instrument_engine(async_engine.sync_engine)
+# SLOW_REQUEST_MS > 0 включает лог медленных запросов вместе с выполненным SQL
+app.add_middleware(metrics.RequestMetricsMiddleware, slow_request_ms=float(os.getenv("SLOW_REQUEST_MS", "0")))
 app.add_middleware(CORSMiddleware, allow_origins=["*"], allow_credentials=True, allow_methods=["*"], allow_headers=["*"])
 
 @app.post("/users/", response_model=schemas.User)
-def create_user_endpoint(user: schemas.UserCreate, db: Session = Depends(get_db)):
-    db_user = crud.get_user_by_telegram_id(db, telegram_id=user.telegram_id)
+async def create_user_endpoint(user: schemas.UserCreate, db: AsyncSession = Depends(get_db)):
+    db_user = await crud.get_user_by_telegram_id(db, telegram_id=user.telegram_id)
     if db_user: raise HTTPException(status_code=400, detail="User already registered")
-    return crud.create_user(db=db, user=user)
+    return await crud.create_user(db=db, user=user)
 
 @app.get("/users/{telegram_id}", response_model=schemas.User)
-def get_user_endpoint(telegram_id: int, db: Session = Depends(get_db)):
-    db_user = crud.get_user_by_telegram_id(db, telegram_id=telegram_id)
+async def get_user_endpoint(telegram_id: int, db: AsyncSession = Depends(get_db)):
+    db_user = await crud.get_user_by_telegram_id(db, telegram_id=telegram_id, with_boards=True)
     if not db_user: raise HTTPException(status_code=404, detail="User not found")
     return db_user
 
+@app.get("/health", include_in_schema=False)
+async def health_endpoint():
+    # Готовность воркера для балансировщика: 503 после SIGTERM, пока идёт задержка перед остановкой (install_drain_hook)
+    if not app.state.ready: return Response(status_code=503)
+    return {"status": "ok"}
+
+@app.get("/cache/stats")
+async def cache_stats_endpoint():
+    return {"user_id": user_id_cache.stats(), "responses": response_cache.stats()}
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics_endpoint():
+    body = shared_metrics.render() if shared_metrics else metrics.REGISTRY.render()
+    return PlainTextResponse(body, media_type=metrics.CONTENT_TYPE)
+
 @app.get("/resolve-username/{username}")
 async def resolve_username_endpoint(username: str):
-    if not bot: raise HTTPException(status_code=500, detail="Bot not configured")
+    if not get_bot(): raise HTTPException(status_code=500, detail="Bot not configured")
     try:
         chat = await bot.get_chat(chat_id=f"@{username}")
         return {"telegram_id": chat.id}
@@ -42,75 +153,237 @@ async def resolve_username_endpoint(username: str):
     except Exception as e: raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/users/{telegram_id}/boards/", response_model=List[schemas.Board])
-def read_user_boards_endpoint(telegram_id: int, db: Session = Depends(get_db)):
-    user = crud.get_user_by_telegram_id(db, telegram_id=telegram_id)
-    if user is None: raise HTTPException(status_code=404, detail="User not found")
-    return crud.get_boards_by_user(db, user_id=user.id)
+async def read_user_boards_endpoint(request: Request, telegram_id: int, db: AsyncSession = Depends(get_db)):
+    user_id = await crud.get_user_id_by_telegram_id(db, telegram_id=telegram_id)
+    if user_id is None: raise HTTPException(status_code=404, detail="User not found")
+    version = await crud.get_boards_version(db, user_id=user_id)
+    async def build():
+        return BOARDS_ADAPTER.dump_json(await crud.get_boards_by_user(db, user_id=user_id))
+    return await cached_json_response(request, f'"u{user_id}v{version}"', build)
 
 @app.post("/users/{telegram_id}/boards/", response_model=schemas.Board)
-def create_board_for_user_endpoint(telegram_id: int, board: schemas.BoardCreate, db: Session = Depends(get_db)):
-    user = crud.get_user_by_telegram_id(db, telegram_id=telegram_id)
-    if user is None:
-        user = crud.create_user(db, schemas.UserCreate(telegram_id=telegram_id))
-    return crud.create_user_board(db=db, board=board, user_id=user.id)
+async def create_board_for_user_endpoint(telegram_id: int, board: schemas.BoardCreate, db: AsyncSession = Depends(get_db)):
+    user_id = await crud.get_user_id_by_telegram_id(db, telegram_id=telegram_id)
+    if user_id is None:
+        user_id = (await crud.create_user(db, schemas.UserCreate(telegram_id=telegram_id))).id
+    return await crud.create_user_board(db=db, board=board, user_id=user_id)
 
 @app.get("/boards/{board_id}", response_model=schemas.Board)
-def read_board_endpoint(board_id: int, db: Session = Depends(get_db)):
-    db_board = crud.get_board_by_id(db, board_id=board_id)
+async def read_board_endpoint(request: Request, board_id: int, db: AsyncSession = Depends(get_db)):
+    db_board = await crud.get_board_by_id(db, board_id=board_id)
     if db_board is None: raise HTTPException(status_code=404, detail="Board not found")
-    return db_board
+    async def build():
+        return schemas.Board.model_validate(db_board).model_dump_json().encode()
+    return await cached_json_response(request, f'"b{board_id}v{db_board.version}"', build)
 
 @app.delete("/boards/{board_id}")
-def delete_board_endpoint(board_id: int, db: Session = Depends(get_db)):
-    db_board = crud.get_board_by_id(db, board_id=board_id)
+async def delete_board_endpoint(board_id: int, db: AsyncSession = Depends(get_db)):
+    db_board = await crud.get_board_by_id(db, board_id=board_id)
     if db_board is None: raise HTTPException(status_code=404, detail="Board not found")
-    crud.delete_board(db=db, board=db_board)
+    await crud.delete_board(db=db, board=db_board)
     return {"ok": True}
 
 @app.get("/users/{telegram_id}/search/", response_model=List[schemas.Item])
-def search_items_endpoint(telegram_id: int, q: str = Query(..., min_length=2), db: Session = Depends(get_db)):
-    user = crud.get_user_by_telegram_id(db, telegram_id)
-    if not user: raise HTTPException(status_code=404, detail="User not found")
-    return crud.search_items_by_title(db, user_id=user.id, query=q)
+async def search_items_endpoint(telegram_id: int, q: str = Query(..., min_length=2), limit: int = Query(20, ge=1, le=100), db: AsyncSession = Depends(get_db)):
+    user_id = await crud.get_user_id_by_telegram_id(db, telegram_id)
+    if user_id is None: raise HTTPException(status_code=404, detail="User not found")
+    return await crud.search_items(db, user_id=user_id, query=q, limit=limit)
 
 @app.post("/users/{telegram_id}/items/", response_model=schemas.Item)
-def create_item_for_user(telegram_id: int, item: schemas.ItemCreate, db: Session = Depends(get_db)):
-    user = crud.get_user_by_telegram_id(db, telegram_id=telegram_id)
-    if user is None: raise HTTPException(status_code=404, detail="User not found")
-    return crud.create_user_item(db=db, item=item, user_id=user.id)
+async def create_item_for_user(telegram_id: int, item: schemas.ItemCreate, on_duplicate: Literal["link", "skip"] = "link", db: AsyncSession = Depends(get_db)):
+    user_id = await crud.get_user_id_by_telegram_id(db, telegram_id=telegram_id)
+    if user_id is None: raise HTTPException(status_code=404, detail="User not found")
+    db_item, _ = await crud.create_user_item(db=db, item=item, user_id=user_id, on_duplicate=on_duplicate)
+    return db_item
+
+@app.post("/users/{telegram_id}/items/with-boards", response_model=schemas.ItemWithBoards)
+async def create_item_with_boards(telegram_id: int, item: schemas.ItemCreate, on_duplicate: Literal["link", "skip"] = "link", db: AsyncSession = Depends(get_db)):
+    # Экран «Куда добавить?» в боте: сохранённый элемент и доски пользователя одним ответом.
+    user_id = await crud.get_user_id_by_telegram_id(db, telegram_id=telegram_id)
+    if user_id is None: raise HTTPException(status_code=404, detail="User not found")
+    db_item, duplicate = await crud.create_user_item(db=db, item=item, user_id=user_id, on_duplicate=on_duplicate)
+    return {"item": db_item, "boards": await crud.get_boards_by_user(db, user_id=user_id), "duplicate": duplicate}
+
+@app.post("/users/{telegram_id}/items/bulk", response_model=List[schemas.Item])
+async def create_items_bulk_for_user(telegram_id: int, payload: schemas.ItemBulkCreate, on_duplicate: Literal["link", "skip"] = "link", db: AsyncSession = Depends(get_db)):
+    user_id = await crud.get_user_id_by_telegram_id(db, telegram_id=telegram_id)
+    if user_id is None: raise HTTPException(status_code=404, detail="User not found")
+    return await crud.create_user_items(db=db, items=payload.items, user_id=user_id, board_id=payload.board_id, on_duplicate=on_duplicate)
+
+@app.get("/users/{telegram_id}/storage", response_model=schemas.StorageUsage)
+async def read_storage_usage(telegram_id: int, db: AsyncSession = Depends(get_db)):
+    user_id = await crud.get_user_id_by_telegram_id(db, telegram_id=telegram_id)
+    if user_id is None: raise HTTPException(status_code=404, detail="User not found")
+    return await crud.get_storage_usage(db, user_id=user_id)
+
+@app.get("/boards/{board_id}/items/", response_model=schemas.ItemPage)
+async def read_board_items(request: Request, board_id: int, limit: int = Query(50, ge=1, le=200), after: Optional[int] = None, before: Optional[int] = None, db: AsyncSession = Depends(get_db)):
+    version = await crud.get_board_version(db, board_id=board_id)
+    async def build():
+        items, next_cursor, prev_cursor = await crud.get_items_page(db, board_id=board_id, limit=limit, after=after, before=before)
+        page = schemas.ItemPage.model_validate({"items": items, "next_cursor": next_cursor, "prev_cursor": prev_cursor}, from_attributes=True)
+        return page.model_dump_json().encode()
+    if version is None: return Response(content=await build(), media_type="application/json")
+    return await cached_json_response(request, f'"b{board_id}v{version}"', build)
 
-@app.get("/boards/{board_id}/items/", response_model=List[schemas.Item])
-def read_board_items(board_id: int, db: Session = Depends(get_db)):
-    return crud.get_items_by_board(db, board_id=board_id)
+@app.get("/boards/{board_id}/view", response_model=schemas.BoardView)
+async def read_board_view(request: Request, board_id: int, limit: int = Query(50, ge=1, le=200), after: Optional[int] = None, before: Optional[int] = None, db: AsyncSession = Depends(get_db)):
+    # Доска и страница элементов одним SQL-запросом; версия доски приходит в той же строке.
+    page = await crud.get_board_page(db, board_id=board_id, limit=limit, after=after, before=before)
+    if page is None: raise HTTPException(status_code=404, detail="Board not found")
+    board, items, next_cursor, prev_cursor = page
+    async def build():
+        view = schemas.BoardView.model_validate({"board": board, "items": items, "next_cursor": next_cursor, "prev_cursor": prev_cursor}, from_attributes=True)
+        return view.model_dump_json().encode()
+    return await cached_json_response(request, f'"b{board_id}v{board.version}"', build)
+
+@app.get("/boards/{board_id}/items/stream")
+async def stream_board_items(board_id: int):
+    # Сессия открывается внутри генератора: она должна жить, пока отдаётся тело ответа.
+    async def generate():
+        async with AsyncSessionLocal() as db:
+            async for item in crud.iter_items_by_board(db, board_id=board_id):
+                yield schemas.Item.model_validate(item).model_dump_json() + "\n"
+    return StreamingResponse(generate(), media_type="application/x-ndjson")
+
+@app.get("/users/{telegram_id}/export")
+async def export_user_archive(telegram_id: int, format: Literal["ndjson", "zip"] = "ndjson", db: AsyncSession = Depends(get_db)):
+    user_id = await crud.get_user_id_by_telegram_id(db, telegram_id=telegram_id)
+    if user_id is None: raise HTTPException(status_code=404, detail="User not found")
+    exporter, media_type = archive.EXPORTERS[format]
+    # Как и в stream_board_items, сессия живёт внутри генератора, пока отдаётся тело ответа.
+    async def generate():
+        async with AsyncSessionLocal() as stream_db:
+            async for chunk in exporter(stream_db, user_id, telegram_id): yield chunk
+    headers = {"Content-Disposition": f'attachment; filename="archive-{telegram_id}.{format}"'}
+    return StreamingResponse(generate(), media_type=media_type, headers=headers)
+
+@app.post("/users/{telegram_id}/import")
+async def import_user_archive(request: Request, telegram_id: int, db: AsyncSession = Depends(get_db)):
+    # Тело — NDJSON (читается потоком) или ZIP (Content-Type: application/zip; сначала копится во временный файл).
+    user_id = await crud.get_user_id_by_telegram_id(db, telegram_id=telegram_id)
+    if user_id is None: raise HTTPException(status_code=404, detail="User not found")
+    try:
+        if request.headers.get("content-type", "").startswith("application/zip"):
+            with tempfile.SpooledTemporaryFile(max_size=IMPORT_SPOOL_SIZE) as file:
+                async for chunk in request.stream(): file.write(chunk)
+                file.seek(0)
+                return await archive.import_records(db, user_id, archive.iter_zip_lines(file))
+        return await archive.import_records(db, user_id, archive.iter_lines(request.stream()))
+    except archive.ArchiveError as e: raise HTTPException(status_code=400, detail=str(e))
 
 @app.get("/items/{item_id}", response_model=schemas.Item)
-def read_item_endpoint(item_id: int, db: Session = Depends(get_db)):
-    db_item = crud.get_item_by_id(db, item_id=item_id)
+async def read_item_endpoint(item_id: int, db: AsyncSession = Depends(get_db)):
+    db_item = await crud.get_item_by_id(db, item_id=item_id)
     if db_item is None: raise HTTPException(status_code=404, detail="Item not found")
     return db_item
 
 @app.put("/items/{item_id}/move/{board_id}", response_model=schemas.Item)
-def move_item(item_id: int, board_id: int, db: Session = Depends(get_db)):
-    item = crud.get_item_by_id(db, item_id=item_id)
+async def move_item(item_id: int, board_id: int, db: AsyncSession = Depends(get_db)):
+    item = await crud.get_item_by_id(db, item_id=item_id)
     if not item: raise HTTPException(status_code=404, detail="Item not found")
-    return crud.move_item_to_board(db, item=item, board_id=board_id)
+    return await crud.move_item_to_board(db, item=item, board_id=board_id)
     
+@app.put("/items/move/{board_id}")
+async def move_items(board_id: int, payload: schemas.ItemIds, db: AsyncSession = Depends(get_db)):
+    moved = await crud.move_items_to_board(db, item_ids=payload.item_ids, board_id=board_id)
+    return {"ok": True, "moved": moved}
+
 @app.delete("/items/{item_id}")
-def delete_item_endpoint(item_id: int, db: Session = Depends(get_db)):
-    success = crud.delete_item_by_id(db, item_id=item_id)
+async def delete_item_endpoint(item_id: int, db: AsyncSession = Depends(get_db)):
+    success = await crud.delete_item_by_id(db, item_id=item_id)
     if not success: raise HTTPException(status_code=404, detail="Item not found")
     return {"ok": True}
 
+NON_MEDIA_TYPES = ('text', 'location')
+
 @app.get("/items/{item_id}/download_url")
-async def get_item_download_url(item_id: int, db: Session = Depends(get_db)):
-    if not bot: raise HTTPException(status_code=500, detail="Bot not configured")
-    db_item = crud.get_item_by_id(db, item_id=item_id)
+async def get_item_download_url(item_id: int, db: AsyncSession = Depends(get_db)):
+    if not get_bot(): raise HTTPException(status_code=500, detail="Bot not configured")
+    db_item = await crud.get_item_by_id(db, item_id=item_id)
     if not db_item: raise HTTPException(status_code=404, detail="Item not found")
-    if db_item.item_type == 'text' or db_item.item_type == 'location':
+    if db_item.item_type in NON_MEDIA_TYPES:
         return {"url": db_item.content, "is_media": False}
     try:
-        file_info = await bot.get_file(db_item.content)
-        return {"url": f"https://api.telegram.org/file/bot{bot_token}/{file_info.file_path}", "is_media": True}
+        file_path = await file_resolver.file_path(db_item.content)
+        return {"url": file_resolver.file_url(file_path), "is_media": True}
     except Exception as e:
         logging.error(f"Failed to get file link: {e}")
-        raise HTTPException(status_code=500, detail="Failed to get file link from Telegram.")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail="Failed to get file link from Telegram.")
+
+@app.get("/boards/{board_id}/download_urls")
+async def get_board_download_urls(board_id: int, db: AsyncSession = Depends(get_db)):
+    if not get_bot(): raise HTTPException(status_code=500, detail="Bot not configured")
+    items = await crud.get_items_by_board(db, board_id=board_id)
+    paths = await file_resolver.resolve_many([item.content for item in items if item.item_type not in NON_MEDIA_TYPES])
+    urls = {}
+    for item in items:
+        if item.item_type in NON_MEDIA_TYPES:
+            urls[item.id] = {"url": item.content, "is_media": False}
+            continue
+        file_path = paths[item.content]
+        if isinstance(file_path, Exception):
+            logging.error(f"Failed to get file link for item {item.id}: {file_path}")
+            urls[item.id] = {"url": None, "is_media": True}
+        else: urls[item.id] = {"url": file_resolver.file_url(file_path), "is_media": True}
+    return {"urls": urls}
+
+@jobs.queue.register("prefetch_board_urls", concurrency=1)
+async def prefetch_board_urls_job(db, job):
+    # Прогревает кэш file_path, чтобы download_url(s) доски отвечали без похода в Telegram.
+    # Кэш общий (Redis), поэтому прогрев виден всем воркерам API, а не только выполнившему задачу.
+    if not get_bot(): raise RuntimeError("Bot not configured")
+    items = await crud.get_items_by_board(db, board_id=job.payload["board_id"])
+    paths = await file_resolver.resolve_many([item.content for item in items if item.item_type not in NON_MEDIA_TYPES])
+    failed = sum(1 for path in paths.values() if isinstance(path, Exception))
+    return {"resolved": len(paths) - failed, "failed": failed}
+
+@app.post("/jobs/items/delete", status_code=202, response_model=schemas.Job)
+async def enqueue_delete_items(payload: schemas.BulkItemIds, db: AsyncSession = Depends(get_db)):
+    return await jobs.queue.enqueue(db, "delete_items", {"item_ids": payload.item_ids})
+
+@app.post("/jobs/items/move/{board_id}", status_code=202, response_model=schemas.Job)
+async def enqueue_move_items(board_id: int, payload: schemas.BulkItemIds, db: AsyncSession = Depends(get_db)):
+    return await jobs.queue.enqueue(db, "move_items", {"item_ids": payload.item_ids, "board_id": board_id})
+
+@app.post("/jobs/boards/{board_id}/delete", status_code=202, response_model=schemas.Job)
+async def enqueue_delete_board(board_id: int, db: AsyncSession = Depends(get_db)):
+    return await jobs.queue.enqueue(db, "delete_board", {"board_id": board_id})
+
+@app.post("/jobs/boards/{board_id}/prefetch-urls", status_code=202, response_model=schemas.Job)
+async def enqueue_prefetch_board_urls(board_id: int, db: AsyncSession = Depends(get_db)):
+    if not get_bot(): raise HTTPException(status_code=500, detail="Bot not configured")
+    # Кэш в памяти процесса при нескольких воркерах прогрел бы только один из них
+    if not file_resolver.cache.shared and int(os.getenv("API_WORKERS", "1")) > 1:
+        raise HTTPException(status_code=409, detail="URL prefetch needs a shared file cache (FILE_CACHE_REDIS_URL) with multiple workers")
+    return await jobs.queue.enqueue(db, "prefetch_board_urls", {"board_id": board_id})
+
+@app.post("/jobs/users/{telegram_id}/export", status_code=202, response_model=schemas.Job)
+async def enqueue_export(telegram_id: int, format: Literal["ndjson", "zip"] = "ndjson", db: AsyncSession = Depends(get_db)):
+    user_id = await crud.get_user_id_by_telegram_id(db, telegram_id=telegram_id)
+    if user_id is None: raise HTTPException(status_code=404, detail="User not found")
+    # Файл экспорта скачивается с любого хоста: нужен общий каталог (см. app.jobs)
+    if not jobs.EXPORT_DIR_SHARED and int(os.getenv("API_INSTANCES", "1")) > 1:
+        raise HTTPException(status_code=409, detail="Export needs a shared JOB_EXPORT_DIR with multiple API instances")
+    return await jobs.queue.enqueue(db, "export_archive", {"user_id": user_id, "telegram_id": telegram_id, "format": format})
+
+@app.post("/jobs/search/rebuild", status_code=202, response_model=schemas.Job)
+async def enqueue_search_rebuild(db: AsyncSession = Depends(get_db)):
+    return await jobs.queue.enqueue(db, "rebuild_search_index", {})
+
+@app.get("/jobs/{job_id}", response_model=schemas.Job)
+async def read_job(job_id: int, db: AsyncSession = Depends(get_db)):
+    job = await jobs.get_job(db, job_id)
+    if job is None: raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@app.get("/jobs/{job_id}/download")
+async def download_job_result(job_id: int, db: AsyncSession = Depends(get_db)):
+    job = await jobs.get_job(db, job_id)
+    if job is None or job.kind != "export_archive": raise HTTPException(status_code=404, detail="Job not found")
+    if job.status != jobs.DONE: raise HTTPException(status_code=409, detail=f"Job is {job.status}")
+    if not os.path.exists(job.result["path"]):
+        host = job.result.get("host")
+        if host and host != socket.gethostname(): raise HTTPException(status_code=409, detail=f"Export file is on host {host}; set a shared JOB_EXPORT_DIR")
+        raise HTTPException(status_code=410, detail="Export file is gone")
+    return FileResponse(job.result["path"], media_type=job.result["media_type"], filename=job.result["filename"])
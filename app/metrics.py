@@ -0,0 +1,263 @@
+import asyncio
+import glob
+import json
+import logging
+import os
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware
+from sqlalchemy import event
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _format_labels(names, values, extra=()):
+    pairs = [*zip(names, values), *extra]
+    if not pairs: return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+def _format_value(value):
+    if value == float("inf"): return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Metric:
+    type = None
+
+    def __init__(self, name: str, documentation: str, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames): raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def render(self, values=None):
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} {self.type}"
+        for key, value in sorted((self._values if values is None else values).items()):
+            yield from self._samples(key, value)
+
+    def merge(self, into: dict, values):
+        """Прибавляет значения другого процесса (из snapshot) к into."""
+        for key, value in values:
+            key = tuple(key)
+            into[key] = into.get(key, 0) + value
+
+    def _samples(self, key, value):
+        yield f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+
+class Counter(Metric):
+    type = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+class Gauge(Metric):
+    type = "gauge"
+
+    def set(self, value: float, **labels):
+        self._values[self._key(labels)] = value
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        state = self._values.get(key)
+        if state is None: state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        # Храним попадания по корзинам, накопительные суммы считаются при выводе
+        state[0][bisect_left(self.buckets, value)] += 1
+        state[1] += value
+        state[2] += 1
+
+    def merge(self, into: dict, values):
+        for key, (counts, total, count) in values:
+            state = into.setdefault(tuple(key), [[0] * (len(self.buckets) + 1), 0.0, 0])
+            state[0] = [a + b for a, b in zip(state[0], counts)]
+            state[1] += total
+            state[2] += count
+
+    def _samples(self, key, state):
+        counts, total, count = state
+        cumulative = 0
+        for bound, hits in zip((*self.buckets, float("inf")), counts):
+            cumulative += hits
+            yield f"{self.name}_bucket{_format_labels(self.labelnames, key, [('le', _format_value(bound))])} {cumulative}"
+        yield f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(total)}"
+        yield f"{self.name}_count{_format_labels(self.labelnames, key)} {count}"
+
+class Registry:
+    """Набор метрик процесса в текстовом формате Prometheus (без внешних зависимостей)."""
+
+    def __init__(self):
+        self._metrics = {}
+
+    def register(self, metric: Metric) -> Metric:
+        if metric.name in self._metrics: raise ValueError(f"Metric {metric.name} is already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, *args, **kwargs) -> Counter: return self.register(Counter(*args, **kwargs))
+    def gauge(self, *args, **kwargs) -> Gauge: return self.register(Gauge(*args, **kwargs))
+    def histogram(self, *args, **kwargs) -> Histogram: return self.register(Histogram(*args, **kwargs))
+
+    def render(self) -> str:
+        return "\n".join(line for metric in self._metrics.values() for line in metric.render()) + "\n"
+
+    def snapshot(self) -> dict:
+        return {name: [[list(key), value] for key, value in metric._values.items()] for name, metric in self._metrics.items()}
+
+def _pid_alive(pid: int) -> bool:
+    try: os.kill(pid, 0)
+    except ProcessLookupError: return False
+    except PermissionError: pass
+    return True
+
+class SharedMetricsDir:
+    """Сводные метрики нескольких воркеров (python -m app.server serve --workers N).
+
+    Каждый воркер раз в `interval` секунд и при остановке сбрасывает свой реестр в {directory}/{pid}.json,
+    /metrics любого воркера складывает все файлы: счётчики и гистограммы суммируются (в том числе
+    завершившихся воркеров — иначе счётчики убывали бы), gauge — только по живым процессам.
+    Каталог очищает мастер при запуске (см. app.server).
+    """
+
+    def __init__(self, registry: Registry, directory: str, interval: float = 1.0):
+        self.registry = registry
+        self.directory = directory
+        self.interval = interval
+        self.path = os.path.join(directory, f"{os.getpid()}.json")
+
+    def write(self):
+        temporary = f"{self.path}.tmp"
+        with open(temporary, "w") as file: json.dump(self.registry.snapshot(), file)
+        os.replace(temporary, self.path)
+
+    async def run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try: self.write()
+            except OSError as e: logging.warning(f"Failed to write metrics snapshot: {e}")
+
+    def render(self) -> str:
+        self.write()
+        merged = {name: {} for name in self.registry._metrics}
+        for path in glob.glob(os.path.join(self.directory, "*.json")):
+            alive = _pid_alive(int(os.path.basename(path).split(".")[0]))
+            try:
+                with open(path) as file: snapshot = json.load(file)
+            except (OSError, ValueError): continue
+            for name, values in snapshot.items():
+                metric = self.registry._metrics.get(name)
+                if metric is None or (metric.type == "gauge" and not alive): continue
+                metric.merge(merged[name], values)
+        return "\n".join(line for name, metric in self.registry._metrics.items() for line in metric.render(merged[name])) + "\n"
+
+REGISTRY = Registry()
+
+HTTP_REQUEST_SECONDS = REGISTRY.histogram("http_request_duration_seconds", "Время обработки HTTP-запроса API", ("method", "route", "status"))
+HTTP_REQUEST_DB_QUERIES = REGISTRY.histogram("http_request_db_queries", "Число SQL-выражений на HTTP-запрос", ("route",), buckets=COUNT_BUCKETS)
+HTTP_REQUEST_DB_SECONDS = REGISTRY.histogram("http_request_db_seconds", "Суммарное время SQL на HTTP-запрос", ("route",))
+DB_QUERY_SECONDS = REGISTRY.histogram("db_query_duration_seconds", "Время выполнения одного SQL-выражения", ("operation",))
+TELEGRAM_API_SECONDS = REGISTRY.histogram("telegram_api_request_duration_seconds", "Время вызова Telegram Bot API", ("method", "outcome"))
+
+class RequestStats:
+    """SQL, выполненный в рамках одного запроса; statements собираются только для лога медленных запросов."""
+
+    __slots__ = ("queries", "db_seconds", "statements")
+
+    def __init__(self, record_statements: bool = False):
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.statements = [] if record_statements else None
+
+current_request: ContextVar = ContextVar("current_request", default=None)
+
+def instrument_engine(engine):
+    """Вешает на (sync) Engine хуки, измеряющие каждое SQL-выражение.
+
+    Для AsyncEngine передаётся `async_engine.sync_engine`: хуки выполняются в контексте задачи,
+    поэтому статистика попадает в RequestStats текущего запроса.
+    """
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("metrics_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["metrics_started"].pop()
+        DB_QUERY_SECONDS.observe(elapsed, operation=(statement.split(None, 1) or [""])[0].upper())
+        stats = current_request.get()
+        if stats is None: return
+        stats.queries += 1
+        stats.db_seconds += elapsed
+        if stats.statements is not None: stats.statements.append((elapsed, statement))
+
+class RequestMetricsMiddleware:
+    """ASGI-middleware: гистограммы задержки по шаблону маршрута и SQL на запрос.
+
+    Время считается до отправки последнего куска тела, так что потоковые ответы учитываются целиком.
+    При `slow_request_ms > 0` запросы дольше порога пишутся в лог вместе с выполненным SQL.
+    """
+
+    def __init__(self, app, slow_request_ms: float = 0):
+        self.app = app
+        self.slow_request_ms = slow_request_ms
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http": return await self.app(scope, receive, send)
+        stats = RequestStats(record_statements=self.slow_request_ms > 0)
+        token = current_request.set(stats)
+        status = 500
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start": status = message["status"]
+            await send(message)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            current_request.reset(token)
+            # Шаблон маршрута вместо пути: /items/{item_id}, а не /items/42
+            route = getattr(scope.get("route"), "path", None) or "unmatched"
+            HTTP_REQUEST_SECONDS.observe(elapsed, method=scope["method"], route=route, status=status)
+            HTTP_REQUEST_DB_QUERIES.observe(stats.queries, route=route)
+            HTTP_REQUEST_DB_SECONDS.observe(stats.db_seconds, route=route)
+            if self.slow_request_ms and elapsed * 1000 >= self.slow_request_ms:
+                log_slow_request(scope, status, elapsed, stats)
+
+def log_slow_request(scope, status, elapsed, stats: RequestStats):
+    lines = [f"Slow request: {scope['method']} {scope['path']} -> {status} in {elapsed * 1000:.1f} ms, "
+             f"{stats.queries} SQL in {stats.db_seconds * 1000:.1f} ms"]
+    lines.extend(f"  [{seconds * 1000:.1f} ms] {' '.join(statement.split())}" for seconds, statement in stats.statements)
+    logging.warning("\n".join(lines))
+
+class TelegramTimingMiddleware(BaseRequestMiddleware):
+    """Middleware сессии aiogram: время каждого вызова Bot API по методу и исходу."""
+
+    def __init__(self, histogram: Histogram = TELEGRAM_API_SECONDS):
+        self.histogram = histogram
+
+    async def __call__(self, make_request, bot, method):
+        started = time.perf_counter()
+        outcome = "ok"
+        try:
+            return await make_request(bot, method)
+        except Exception as e:
+            outcome = type(e).__name__
+            raise
+        finally:
+            self.histogram.observe(time.perf_counter() - started, method=method.__api_method__, outcome=outcome)
@@ -1,24 +1,54 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, func, BigInteger
+from sqlalchemy import JSON, Column, Integer, String, Text, ForeignKey, DateTime, func, BigInteger, Index, DDL, case, event, literal_column
+from sqlalchemy.dialects import postgresql  # noqa: F401 — регистрирует to_tsvector/to_tsquery для func
 from sqlalchemy.orm import relationship
 from .database import Base
 
+def item_search_document(title, content, item_type):
+    # Для медиа в content лежит file_id, индексировать его бессмысленно.
+    # Константы вшиты литералами, чтобы выражение в запросе совпадало с выражением индекса.
+    empty = literal_column("''")
+    text_content = case((item_type == literal_column("'text'"), content), else_=empty)
+    return func.to_tsvector(literal_column("'simple'::regconfig"), func.coalesce(title, empty).op("||")(literal_column("' '")).op("||")(func.coalesce(text_content, empty)))
+
 class User(Base):
     __tablename__ = "users"
     id = Column(Integer, primary_key=True, index=True)
     telegram_id = Column(BigInteger, unique=True, index=True, nullable=False)
     username = Column(String, nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
-    boards = relationship("Board", back_populates="owner")
-    items = relationship("Item", back_populates="owner")
+    # Счётчики версий для ETag: растут при любом изменении списка досок / содержимого доски.
+    boards_version = Column(Integer, nullable=False, default=0, server_default="0")
+    # Коллекции грузятся только явно (selectinload), случайная ленивая загрузка — ошибка.
+    boards = relationship("Board", back_populates="owner", lazy="raise_on_sql")
+    items = relationship("Item", back_populates="owner", lazy="raise_on_sql")
 
 class Board(Base):
     __tablename__ = "boards"
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, index=True)
     emoji_icon = Column(String, nullable=True)
-    owner_id = Column(Integer, ForeignKey("users.id"))
+    owner_id = Column(Integer, ForeignKey("users.id"), index=True)
+    version = Column(Integer, nullable=False, default=0, server_default="0")
     owner = relationship("User", back_populates="boards")
-    items = relationship("Item", back_populates="board")
+    items = relationship("Item", back_populates="board", lazy="raise_on_sql")
+    # ETag доски — "b{id}v{version}": в SQLite без AUTOINCREMENT id удалённой последней доски
+    # достаётся новой (с version=0), и клиент получил бы 304 и чужое тело из кэша ответов.
+    __table_args__ = {"sqlite_autoincrement": True}
+
+class Media(Base):
+    """Файл Telegram, общий для всех сохранивших его элементов.
+
+    Ключ — file_unique_id: он одинаков у всех копий файла, тогда как file_id у пересланных копий разный.
+    """
+    __tablename__ = "media"
+    id = Column(Integer, primary_key=True)
+    file_unique_id = Column(String, unique=True, nullable=False)
+    media_type = Column(String(50), nullable=False)
+    file_id = Column(String, nullable=False)
+    file_size = Column(BigInteger, nullable=True)
+    duration = Column(Integer, nullable=True)
+    mime_type = Column(String, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
 
 class Item(Base):
     __tablename__ = "items"
@@ -28,5 +58,56 @@ class Item(Base):
     content = Column(String)
     owner_id = Column(Integer, ForeignKey("users.id"))
     board_id = Column(Integer, ForeignKey("boards.id"), nullable=True)
+    # Для медиа content по-прежнему хранит file_id (его читают бот и фронтенд), метаданные — в media.
+    media_id = Column(Integer, ForeignKey("media.id"), nullable=True)
     owner = relationship("User", back_populates="items")
-    board = relationship("Board", back_populates="items")
\ No newline at end of file
+    board = relationship("Board", back_populates="items")
+    __table_args__ = (
+        Index("ix_items_owner_id_board_id", "owner_id", "board_id"),
+        Index("ix_items_board_id_id", "board_id", "id"),
+        # «Этот файл у пользователя уже сохранён?» и подсчёт занятого места
+        Index("ix_items_owner_id_media_id", "owner_id", "media_id"),
+        Index("ix_items_search_document", item_search_document(title, content, item_type), postgresql_using="gin").ddl_if(dialect="postgresql"),
+    )
+
+class FsmState(Base):
+    """Состояние FSM бота (см. botcore.storage.SQLStorage): общее для всех реплик бота."""
+    __tablename__ = "fsm_states"
+    key = Column(String, primary_key=True)
+    state = Column(String, nullable=True)
+    data = Column(Text, nullable=True)
+    expires_at = Column(DateTime(timezone=True), nullable=False, index=True)
+
+class Job(Base):
+    """Фоновая задача (см. app.jobs): очередь живёт в БД и переживает перезапуск API."""
+    __tablename__ = "jobs"
+    id = Column(Integer, primary_key=True)
+    kind = Column(String(50), nullable=False)
+    payload = Column(JSON, nullable=False)
+    # queued -> running -> done | failed; упавшая попытка возвращает задачу в queued с отсрочкой run_after
+    status = Column(String(20), nullable=False, default="queued")
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False, default=3)
+    result = Column(JSON, nullable=True)
+    error = Column(Text, nullable=True)
+    run_after = Column(DateTime(timezone=True), nullable=False)
+    # Аренда исполнителя: running-задача с истёкшим locked_until снова доступна (процесс упал)
+    locked_until = Column(DateTime(timezone=True), nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+    __table_args__ = (Index("ix_jobs_status_run_after", "status", "run_after"),)
+
+# В SQLite (тесты, локальный запуск) полнотекстовый поиск идёт через FTS5-таблицу, синхронизируемую триггерами.
+SQLITE_FTS_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS items_fts USING fts5(title, content, tokenize='unicode61 remove_diacritics 2')",
+    """CREATE TRIGGER IF NOT EXISTS items_fts_insert AFTER INSERT ON items BEGIN
+        INSERT INTO items_fts(rowid, title, content) VALUES (new.id, new.title, CASE WHEN new.item_type = 'text' THEN new.content ELSE '' END);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS items_fts_update AFTER UPDATE OF title, content, item_type ON items BEGIN
+        DELETE FROM items_fts WHERE rowid = old.id;
+        INSERT INTO items_fts(rowid, title, content) VALUES (new.id, new.title, CASE WHEN new.item_type = 'text' THEN new.content ELSE '' END);
+    END""",
+    "CREATE TRIGGER IF NOT EXISTS items_fts_delete AFTER DELETE ON items BEGIN DELETE FROM items_fts WHERE rowid = old.id; END",
+]
+for statement in SQLITE_FTS_DDL:
+    event.listen(Item.__table__, "after_create", DDL(statement).execute_if(dialect="sqlite"))
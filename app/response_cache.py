@@ -0,0 +1,32 @@
+from collections import OrderedDict
+
+class ResponseCache:
+    """LRU готовых JSON-ответов, ключ включает ETag.
+
+    ETag строится из счётчика версий в БД, поэтому устаревшая запись никогда не совпадёт
+    с актуальным ключом и просто вытесняется со временем.
+    """
+
+    def __init__(self, maxsize: int = 2048):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        body = self._entries.get(key)
+        if body is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._entries.move_to_end(key)
+        return body
+
+    def set(self, key, body: bytes):
+        self._entries[key] = body
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "size": len(self._entries), "maxsize": self.maxsize}
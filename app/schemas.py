@@ -1,27 +1,66 @@
-from pydantic import BaseModel
-from typing import List, Optional
+from pydantic import BaseModel, Field
+from datetime import datetime
+from typing import Any, Dict, List, Optional
 
 class ItemBase(BaseModel):
     item_type: str
     title: str
     content: str
+class MediaInfo(BaseModel):
+    file_unique_id: str
+    file_size: Optional[int] = None
+    duration: Optional[int] = None
+    mime_type: Optional[str] = None
 class ItemCreate(ItemBase):
-    pass
+    media: Optional[MediaInfo] = None
 class Item(ItemBase):
     id: int
     owner_id: int
     board_id: Optional[int] = None
+    media_id: Optional[int] = None
     class Config: from_attributes = True
+class ItemBulkCreate(BaseModel):
+    items: List[ItemCreate] = Field(min_length=1, max_length=100)
+    board_id: Optional[int] = None
+class ArchiveItem(ItemCreate):
+    board_id: Optional[int] = None
+class ItemIds(BaseModel):
+    item_ids: List[int] = Field(min_length=1, max_length=100)
+class BulkItemIds(BaseModel):
+    # Для фоновых задач: объём не ограничен длительностью HTTP-запроса
+    item_ids: List[int] = Field(min_length=1, max_length=10000)
+class ItemPage(BaseModel):
+    items: List[Item]
+    next_cursor: Optional[int] = None
+    prev_cursor: Optional[int] = None
 
 class BoardBase(BaseModel):
     name: str
     emoji_icon: Optional[str] = None
 class BoardCreate(BoardBase):
     pass
+class ArchiveBoard(BoardBase):
+    id: int
 class Board(BoardBase):
     id: int
     owner_id: int
     class Config: from_attributes = True
+class BoardView(ItemPage):
+    board: Board
+class ItemWithBoards(BaseModel):
+    item: Item
+    boards: List[Board]
+    duplicate: bool = False
+
+class TypeUsage(BaseModel):
+    items: int = 0
+    unique_media: int = 0
+    bytes: int = 0
+class StorageUsage(BaseModel):
+    items: int
+    unique_media: int
+    bytes: int
+    by_type: Dict[str, TypeUsage]
 
 class User(BaseModel):
     id: int
@@ -31,4 +70,15 @@ class User(BaseModel):
     class Config: from_attributes = True
 class UserCreate(BaseModel):
     telegram_id: int
-    username: Optional[str] = None
\ No newline at end of file
+    username: Optional[str] = None
+class Job(BaseModel):
+    id: int
+    kind: str
+    status: str
+    attempts: int
+    max_attempts: int
+    result: Optional[Any] = None
+    error: Optional[str] = None
+    created_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    class Config: from_attributes = True
@@ -0,0 +1,58 @@
+import re
+from sqlalchemy import func, literal_column, or_, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from . import models
+
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+def query_terms(query: str):
+    return TOKEN_RE.findall(query.lower())
+
+async def _search_postgresql(db: AsyncSession, user_id: int, terms, limit: int):
+    # Каждое слово ищем как префикс: "прое" найдёт "проект".
+    tsquery = func.to_tsquery(literal_column("'simple'::regconfig"), " & ".join(f"{term}:*" for term in terms))
+    document = models.item_search_document(models.Item.title, models.Item.content, models.Item.item_type)
+    query = (select(models.Item)
+             .where(models.Item.owner_id == user_id, document.op("@@")(tsquery))
+             .order_by(func.ts_rank(document, tsquery).desc(), models.Item.id.desc())
+             .limit(limit))
+    return (await db.scalars(query)).all()
+
+async def _search_sqlite(db: AsyncSession, user_id: int, terms, limit: int):
+    match = " ".join(f'"{term}"*' for term in terms)
+    statement = text(
+        "SELECT items.* FROM items_fts JOIN items ON items.id = items_fts.rowid "
+        "WHERE items_fts MATCH :match AND items.owner_id = :user_id "
+        "ORDER BY bm25(items_fts), items.id DESC LIMIT :limit"
+    ).columns(*models.Item.__table__.columns)
+    query = select(models.Item).from_statement(statement)
+    return (await db.scalars(query, {"match": match, "user_id": user_id, "limit": limit})).all()
+
+async def _search_like(db: AsyncSession, user_id: int, terms, limit: int):
+    conditions = [or_(models.Item.title.ilike(f"%{term}%"), models.Item.content.ilike(f"%{term}%")) for term in terms]
+    query = select(models.Item).where(models.Item.owner_id == user_id, *conditions).order_by(models.Item.id.desc()).limit(limit)
+    return (await db.scalars(query)).all()
+
+BACKENDS = {"postgresql": _search_postgresql, "sqlite": _search_sqlite}
+
+async def search_items(db: AsyncSession, user_id: int, query: str, limit: int = 20):
+    terms = query_terms(query)
+    if not terms: return []
+    backend = BACKENDS.get(db.bind.dialect.name, _search_like)
+    return await backend(db, user_id, terms, limit)
+
+async def rebuild_index(db: AsyncSession):
+    dialect = db.bind.dialect.name
+    if dialect == "postgresql":
+        # CONCURRENTLY не блокирует запись в items, но выполняется только вне транзакции
+        async with db.bind.connect() as connection:
+            connection = await connection.execution_options(isolation_level="AUTOCOMMIT")
+            await connection.execute(text("REINDEX INDEX CONCURRENTLY ix_items_search_document"))
+        return
+    if dialect == "sqlite":
+        await db.execute(text("DELETE FROM items_fts"))
+        await db.execute(text(
+            "INSERT INTO items_fts(rowid, title, content) "
+            "SELECT id, title, CASE WHEN item_type = 'text' THEN content ELSE '' END FROM items"
+        ))
+    await db.commit()
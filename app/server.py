@@ -0,0 +1,93 @@
+"""Продакшен-запуск API и разовые команды схемы БД.
+
+    python -m app.server migrate                  # alembic upgrade head — один раз перед выкладкой
+    python -m app.server serve --workers 4        # несколько процессов-воркеров
+
+serve запускает gunicorn с uvicorn-воркерами и preload: приложение импортируется один раз в мастере,
+воркеры получают его через fork. Где gunicorn нет (Windows), запускается uvicorn --workers — там
+каждый воркер импортирует приложение сам. На SIGTERM воркер сразу отвечает 503 на /health и ещё
+--drain-delay секунд обслуживает запросы, пока балансировщик выводит его из ротации; затем сервер
+закрывает сокет, дожидается текущих запросов до --graceful-timeout, и lifespan доделывает фоновые задачи.
+При нескольких воркерах /metrics суммирует метрики всех процессов через каталог METRICS_DIR
+(по умолчанию временный, очищается при запуске). Учтите соединения с БД: на каждый воркер до DB_POOL_SIZE + DB_MAX_OVERFLOW.
+"""
+import argparse
+import glob
+import importlib.util
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP = "app.main:app"
+
+def migrate(revision: str = "head"):
+    from alembic import command
+    from alembic.config import Config
+    command.upgrade(Config(os.path.join(ROOT, "alembic.ini")), revision)
+
+def prepare_metrics_dir(workers: int):
+    # Сводные /metrics по всем воркерам (app.metrics.SharedMetricsDir); снимки прошлого запуска удаляем
+    directory = os.getenv("METRICS_DIR")
+    if not directory:
+        if workers <= 1: return
+        directory = tempfile.mkdtemp(prefix="izbranoe-metrics-")
+    os.makedirs(directory, exist_ok=True)
+    for path in glob.glob(os.path.join(directory, "*.json")): os.remove(path)
+    os.environ["METRICS_DIR"] = directory
+
+def _worker_class():
+    # В новых версиях uvicorn воркер для gunicorn вынесен в пакет uvicorn-worker
+    return "uvicorn_worker.UvicornWorker" if importlib.util.find_spec("uvicorn_worker") else "uvicorn.workers.UvicornWorker"
+
+def serve_gunicorn(args):
+    from gunicorn.app.base import BaseApplication
+
+    class Server(BaseApplication):
+        def load_config(self):
+            self.cfg.set("bind", f"{args.host}:{args.port}")
+            self.cfg.set("workers", args.workers)
+            self.cfg.set("worker_class", _worker_class())
+            self.cfg.set("preload_app", True)
+            # Мастер ждёт воркер с момента SIGTERM: задержка перед остановкой входит в это время
+            self.cfg.set("graceful_timeout", args.graceful_timeout + args.drain_delay)
+            self.cfg.set("keepalive", args.keepalive)
+
+        def load(self):
+            from app.main import app
+            return app
+
+    Server().run()
+
+def serve_uvicorn(args):
+    import uvicorn
+    uvicorn.run(APP, host=args.host, port=args.port, workers=args.workers, timeout_graceful_shutdown=args.graceful_timeout,
+                timeout_keep_alive=args.keepalive, proxy_headers=True)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+    upgrade = commands.add_parser("migrate", help="применить миграции схемы (alembic upgrade)")
+    upgrade.add_argument("revision", nargs="?", default="head")
+    serve = commands.add_parser("serve", help="запустить API")
+    serve.add_argument("--host", default=os.getenv("API_HOST", "0.0.0.0"))
+    serve.add_argument("--port", type=int, default=int(os.getenv("API_PORT", "8000")))
+    serve.add_argument("--workers", type=int, default=int(os.getenv("API_WORKERS", str(os.cpu_count() or 1))))
+    serve.add_argument("--graceful-timeout", type=int, default=int(os.getenv("API_GRACEFUL_TIMEOUT", "30")))
+    serve.add_argument("--drain-delay", type=int, default=int(os.getenv("API_DRAIN_DELAY", "5")), help="секунд между SIGTERM и остановкой, /health уже 503")
+    serve.add_argument("--keepalive", type=int, default=int(os.getenv("API_KEEPALIVE", "5")))
+    serve.add_argument("--server", choices=("auto", "gunicorn", "uvicorn"), default=os.getenv("API_SERVER", "auto"))
+    serve.add_argument("--migrate", action="store_true", help="сначала применить миграции (один раз, в мастере)")
+    args = parser.parse_args()
+
+    if args.command == "migrate": return migrate(args.revision)
+    if args.migrate: migrate()
+    # Воркеры наследуют окружение: приложение знает, что процессов несколько (см. prefetch-urls)
+    os.environ["API_WORKERS"] = str(args.workers)
+    os.environ["API_DRAIN_DELAY"] = str(args.drain_delay)
+    prepare_metrics_dir(args.workers)
+    use_gunicorn = args.server == "gunicorn" or (args.server == "auto" and sys.platform != "win32" and importlib.util.find_spec("gunicorn"))
+    (serve_gunicorn if use_gunicorn else serve_uvicorn)(args)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+import asyncio
+import os
+import time
+from collections import OrderedDict
+
+# Telegram гарантирует, что ссылка на файл живёт не меньше часа; берём с запасом.
+FILE_LINK_TTL = 55 * 60
+
+class LocalFilePathCache:
+    """file_id -> file_path в памяти процесса (LRU с TTL): каждый воркер API прогревает свой."""
+
+    shared = False
+
+    def __init__(self, ttl: float = FILE_LINK_TTL, maxsize: int = 50000):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+
+    async def get_many(self, file_ids):
+        now, found = time.monotonic(), {}
+        for file_id in file_ids:
+            entry = self._entries.get(file_id)
+            if entry and entry[1] > now: found[file_id] = entry[0]
+        return found
+
+    async def set(self, file_id: str, file_path: str):
+        self._entries[file_id] = (file_path, time.monotonic() + self.ttl)
+        self._entries.move_to_end(file_id)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+class RedisFilePathCache:
+    """Общий для всех воркеров кэш в Redis: прогрев (задача prefetch_board_urls) виден каждому."""
+
+    shared = True
+
+    def __init__(self, client, ttl: float = FILE_LINK_TTL, prefix: str = "file_path:"):
+        self.client = client
+        self.ttl = ttl
+        self.prefix = prefix
+
+    async def get_many(self, file_ids):
+        file_ids = list(file_ids)
+        if not file_ids: return {}
+        values = await self.client.mget([f"{self.prefix}{file_id}" for file_id in file_ids])
+        return {file_id: value.decode() if isinstance(value, bytes) else value for file_id, value in zip(file_ids, values) if value is not None}
+
+    async def set(self, file_id: str, file_path: str):
+        await self.client.set(f"{self.prefix}{file_id}", file_path, ex=int(self.ttl))
+
+def create_file_path_cache():
+    # Отдельный URL не обязателен: по умолчанию тот же Redis, что и у кэша user_id
+    redis_url = os.getenv("FILE_CACHE_REDIS_URL") or os.getenv("USER_CACHE_REDIS_URL")
+    if redis_url:
+        import redis.asyncio as redis
+        return RedisFilePathCache(redis.from_url(redis_url))
+    return LocalFilePathCache(maxsize=int(os.getenv("FILE_CACHE_SIZE", "50000")))
+
+class FileUrlResolver:
+    """Кэш file_id -> file_path поверх bot.get_file.
+
+    Одновременные запросы одного file_id склеиваются в один вызов Telegram API,
+    а общее число параллельных вызовов ограничено max_concurrency.
+    """
+
+    def __init__(self, bot, cache=None, max_concurrency: int = 8):
+        self.bot = bot
+        self.cache = cache or LocalFilePathCache()
+        self._inflight = {}
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+
+    def file_url(self, file_path: str):
+        return f"https://api.telegram.org/file/bot{self.bot.token}/{file_path}"
+
+    async def file_path(self, file_id: str):
+        cached = (await self.cache.get_many([file_id])).get(file_id)
+        if cached is not None: return cached
+        return await self._resolve(file_id)
+
+    async def _resolve(self, file_id: str):
+        task = self._inflight.get(file_id)
+        if task is None:
+            task = asyncio.ensure_future(self._fetch(file_id))
+            self._inflight[file_id] = task
+            task.add_done_callback(lambda _: self._inflight.pop(file_id, None))
+        # shield: отмена одного ожидающего запроса не должна отменять общий вызов для остальных
+        return await asyncio.shield(task)
+
+    async def _fetch(self, file_id: str):
+        async with self._semaphore:
+            file = await self.bot.get_file(file_id)
+        await self.cache.set(file_id, file.file_path)
+        return file.file_path
+
+    async def resolve_many(self, file_ids):
+        """Возвращает {file_id: file_path | исключение} для всех file_ids."""
+        unique_ids = list(dict.fromkeys(file_ids))
+        # Одним обращением к кэшу (MGET в Redis), в Telegram — только промахи
+        found = await self.cache.get_many(unique_ids)
+        missing = [file_id for file_id in unique_ids if file_id not in found]
+        results = await asyncio.gather(*(self._resolve(file_id) for file_id in missing), return_exceptions=True)
+        found.update(zip(missing, results))
+        return found
@@ -0,0 +1,225 @@
+"""Нагрузочный прогон API и сценариев бота с отчётом в JSON.
+
+Заполняет базу синтетическими данными, прогоняет каждый эндпоинт app/main.py через ASGI-клиент
+в том же процессе и воспроизводит цепочки запросов бота (реальные обработчики bot.py поверх
+api_request) с заглушкой вместо Telegram Bot API. Для каждого эндпоинта и сценария считает
+пропускную способность, задержки p50/p95/p99 и число SQL-выражений на запрос:
+
+    python -m benchmarks.load --users 50 --requests 300 --concurrency 20 --output bench.json
+
+Без --database-url используется временная SQLite-база. Результаты разных релизов сравниваются
+по полям JSON-отчёта.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+from benchmarks.query_counts import QueryCounter
+from benchmarks.query_plans import WORDS, percentile, seed
+
+STUB_TOKEN = "123456:stub-token"
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--database-url", help="по умолчанию — временная SQLite-база")
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--boards", type=int, default=5, help="досок на пользователя")
+    parser.add_argument("--items", type=int, default=50, help="элементов на доску")
+    parser.add_argument("--requests", type=int, default=300, help="запросов на эндпоинт / прогонов на сценарий")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="файл для JSON-отчёта (по умолчанию stdout)")
+    return parser.parse_args()
+
+def summarize(latencies, elapsed, statements, errors):
+    count = len(latencies)
+    return {
+        "requests": count,
+        "errors": errors,
+        "throughput_rps": round(count / elapsed, 1) if elapsed else None,
+        "p50_ms": round(percentile(latencies, 0.50), 3),
+        "p95_ms": round(percentile(latencies, 0.95), 3),
+        "p99_ms": round(percentile(latencies, 0.99), 3),
+        "sql_per_request": round(statements / count, 2) if count else None,
+    }
+
+async def measure(engine, count, concurrency, run_one):
+    """Выполняет run_one(i) count раз с заданной параллельностью; run_one возвращает True при успехе."""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, errors = [], 0
+    async def one(i):
+        nonlocal errors
+        async with semaphore:
+            started = time.perf_counter()
+            try: ok = await run_one(i)
+            except Exception: ok = False
+            latencies.append((time.perf_counter() - started) * 1000)
+            if not ok: errors += 1
+    with QueryCounter(engine) as counter:
+        started = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(count)))
+        elapsed = time.perf_counter() - started
+    return summarize(latencies, elapsed, counter.count, errors)
+
+def endpoint_scenarios(rnd, telegram_ids, board_ids, item_ids):
+    """Имя эндпоинта -> функция, строящая (method, url, kwargs) для i-го запроса."""
+    new_users = iter(range(20_000_000, 30_000_000))
+    def item_payload():
+        title = " ".join(rnd.sample(WORDS, 2))
+        return {"item_type": "text", "title": title, "content": title}
+    return {
+        "POST /users/": lambda i: ("POST", "/users/", {"json": {"telegram_id": next(new_users)}}),
+        "GET /users/{telegram_id}": lambda i: ("GET", f"/users/{rnd.choice(telegram_ids)}", {}),
+        "GET /users/{telegram_id}/boards/": lambda i: ("GET", f"/users/{rnd.choice(telegram_ids)}/boards/", {}),
+        "POST /users/{telegram_id}/boards/": lambda i: ("POST", f"/users/{rnd.choice(telegram_ids)}/boards/", {"json": {"name": f"Нагрузка {i}", "emoji_icon": "🧪"}}),
+        "GET /boards/{board_id}": lambda i: ("GET", f"/boards/{rnd.choice(board_ids)}", {}),
+        "GET /boards/{board_id}/items/": lambda i: ("GET", f"/boards/{rnd.choice(board_ids)}/items/", {"params": {"limit": 10}}),
+        "GET /boards/{board_id}/view": lambda i: ("GET", f"/boards/{rnd.choice(board_ids)}/view", {"params": {"limit": 10}}),
+        "GET /boards/{board_id}/items/stream": lambda i: ("GET", f"/boards/{rnd.choice(board_ids)}/items/stream", {}),
+        "GET /boards/{board_id}/download_urls": lambda i: ("GET", f"/boards/{rnd.choice(board_ids)}/download_urls", {}),
+        "GET /users/{telegram_id}/search/": lambda i: ("GET", f"/users/{rnd.choice(telegram_ids)}/search/", {"params": {"q": rnd.choice(WORDS)[:4]}}),
+        "POST /users/{telegram_id}/items/": lambda i: ("POST", f"/users/{rnd.choice(telegram_ids)}/items/", {"json": item_payload()}),
+        "POST /users/{telegram_id}/items/with-boards": lambda i: ("POST", f"/users/{rnd.choice(telegram_ids)}/items/with-boards", {"json": item_payload()}),
+        "POST /users/{telegram_id}/items/bulk": lambda i: ("POST", f"/users/{rnd.choice(telegram_ids)}/items/bulk", {"json": {"items": [item_payload() for _ in range(10)]}}),
+        "GET /users/{telegram_id}/storage": lambda i: ("GET", f"/users/{rnd.choice(telegram_ids)}/storage", {}),
+        "GET /items/{item_id}": lambda i: ("GET", f"/items/{rnd.choice(item_ids)}", {}),
+        "GET /items/{item_id}/download_url": lambda i: ("GET", f"/items/{rnd.choice(item_ids)}/download_url", {}),
+        "PUT /items/{item_id}/move/{board_id}": lambda i: ("PUT", f"/items/{rnd.choice(item_ids)}/move/{rnd.choice(board_ids)}", {}),
+        "PUT /items/move/{board_id}": lambda i: ("PUT", f"/items/move/{rnd.choice(board_ids)}", {"json": {"item_ids": rnd.sample(item_ids, 10)}}),
+        "GET /resolve-username/{username}": lambda i: ("GET", f"/resolve-username/bench{i}", {}),
+        "DELETE /items/{item_id}": lambda i: ("DELETE", f"/items/{item_ids.pop()}", {}),
+        "GET /cache/stats": lambda i: ("GET", "/cache/stats", {}),
+    }
+
+def bot_flows(botmod, rnd, boards_by_owner):
+    """Цепочки запросов бота: реальные обработчики bot.py с заглушкой Telegram на каждый прогон."""
+    from aiogram import Bot
+    from aiogram.fsm.context import FSMContext
+    from aiogram.fsm.storage.base import StorageKey
+    from aiogram.fsm.storage.memory import MemoryStorage
+    from aiogram.types import CallbackQuery, Message
+    from benchmarks.telegram_stub import StubSession
+    from botcore.fake_updates import fake_callback_update, fake_message_update
+
+    storage = MemoryStorage()
+    owners = list(boards_by_owner)
+
+    def stub_bot():
+        return Bot(token=STUB_TOKEN, session=StubSession())
+    def message(bot, chat_id, text):
+        return Message.model_validate(fake_message_update(chat_id, text)["message"], context={"bot": bot})
+    def callback(bot, chat_id, data):
+        return CallbackQuery.model_validate(fake_callback_update(chat_id, data)["callback_query"], context={"bot": bot})
+
+    async def save_then_move(i):
+        # process_and_save_item: POST item вместе со списком досок; затем кнопка перемещения: PUT move
+        bot, chat_id = stub_bot(), rnd.choice(owners)
+        title = " ".join(rnd.sample(WORDS, 2))
+        await botmod.process_and_save_item(message(bot, chat_id, title), {"item_type": "text", "title": title, "content": title})
+        markup = next((call.reply_markup for call in reversed(bot.session.calls) if getattr(call, "reply_markup", None)), None)
+        if not markup: return False
+        await botmod.cb_move_item(callback(bot, chat_id, markup.inline_keyboard[0][0].callback_data))
+        return True
+
+    async def view_board(i):
+        # cb_show_board_contents: GET /boards/{id}/view
+        bot, chat_id = stub_bot(), rnd.choice(owners)
+        await botmod.cb_show_board_contents(callback(bot, chat_id, f"view_board:{rnd.choice(boards_by_owner[chat_id])}"))
+        return True
+
+    async def back_to_boards(i):
+        bot, chat_id = stub_bot(), rnd.choice(owners)
+        await botmod.cb_back_to_boards(callback(bot, chat_id, "back_to_view_list"))
+        return True
+
+    async def search(i):
+        bot, chat_id = stub_bot(), rnd.choice(owners)
+        state = FSMContext(storage=storage, key=StorageKey(bot_id=bot.id, chat_id=chat_id, user_id=chat_id))
+        await botmod.process_search_query(message(bot, chat_id, rnd.choice(WORDS)[:4]), state)
+        return True
+
+    return {
+        "save -> list boards -> move": save_then_move,
+        "view board -> board info": view_board,
+        "back to board list": back_to_boards,
+        "search": search,
+    }
+
+async def run(args):
+    import httpx
+    from sqlalchemy import select
+    from app import models
+    from app.database import SessionLocal, async_engine, engine
+    import app.main as api_main
+    import bot as botmod
+    from benchmarks.telegram_stub import StubSession
+
+    # httpx пишет в INFO каждую строку запроса — это искажает замеры и засоряет stderr
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    rnd = random.Random(args.seed)
+    models.Base.metadata.create_all(engine)
+    with SessionLocal() as db:
+        seed(db, models, args, rnd)
+        telegram_ids = db.scalars(select(models.User.telegram_id)).all()
+        owners = db.execute(select(models.User.telegram_id, models.Board.id).join(models.Board, models.Board.owner_id == models.User.id)).all()
+        item_ids = db.scalars(select(models.Item.id)).all()
+    boards_by_owner = {}
+    for telegram_id, board_id in owners: boards_by_owner.setdefault(telegram_id, []).append(board_id)
+    board_ids = [board_id for _, board_id in owners]
+
+    api_main.get_bot().session = StubSession()
+    botmod.bot.session = StubSession()
+    report = {
+        "meta": {
+            "started_at": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "database": async_engine.dialect.name,
+            "users": len(telegram_ids), "boards": len(board_ids), "items": len(item_ids),
+            "requests": args.requests, "concurrency": args.concurrency,
+        },
+        "endpoints": {},
+        "bot_flows": {},
+    }
+    sync_engine = async_engine.sync_engine
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=api_main.app), base_url="http://api") as client:
+        scenarios = endpoint_scenarios(rnd, telegram_ids, board_ids, item_ids)
+        for name, make_request in scenarios.items():
+            async def call(i, make_request=make_request):
+                method, url, kwargs = make_request(i)
+                response = await client.request(method, url, **kwargs)
+                return response.status_code < 400
+            report["endpoints"][name] = await measure(sync_engine, args.requests, args.concurrency, call)
+            print(f"{name}: {report['endpoints'][name]}", file=sys.stderr)
+
+    await botmod.api.start()
+    try:
+        for name, flow in bot_flows(botmod, rnd, boards_by_owner).items():
+            report["bot_flows"][name] = await measure(sync_engine, args.requests, args.concurrency, flow)
+            print(f"{name}: {report['bot_flows'][name]}", file=sys.stderr)
+    finally:
+        await botmod.api.close()
+    await async_engine.dispose()
+    return report
+
+def main():
+    args = parse_args()
+    with tempfile.TemporaryDirectory() as directory:
+        os.environ["DATABASE_URL"] = args.database_url or f"sqlite:///{directory}/load.db"
+        os.environ["BOT_TOKEN"] = STUB_TOKEN
+        os.environ["API_IN_PROCESS"] = "1"
+        report = asyncio.run(run(args))
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f: f.write(output)
+    else: print(output)
+
+if __name__ == "__main__":
+    main()
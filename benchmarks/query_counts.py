@@ -0,0 +1,112 @@
+"""Проверка числа SQL-запросов на каждый эндпоинт API.
+
+Прогоняет эндпоинты через ASGI-клиент на временной SQLite-базе и сравнивает число выполненных
+SQL-выражений с бюджетом из QUERY_BUDGETS. Завершается с кодом 1, если бюджет превышен:
+
+    python -m benchmarks.query_counts
+"""
+import asyncio
+import os
+import sys
+import tempfile
+
+class QueryCounter:
+    """Считает SQL-выражения, выполненные движком, пока открыт контекст."""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.statements = []
+
+    def _record(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+    def __enter__(self):
+        from sqlalchemy import event
+        self.statements = []
+        event.listen(self.engine, "before_cursor_execute", self._record)
+        return self
+
+    def __exit__(self, *exc_info):
+        from sqlalchemy import event
+        event.remove(self.engine, "before_cursor_execute", self._record)
+
+    @property
+    def count(self):
+        return len(self.statements)
+
+QUERY_BUDGETS = {
+    "POST /users/": 3,
+    "GET /users/{telegram_id}": 2,
+    "POST /users/{telegram_id}/boards/": 3,
+    "GET /users/{telegram_id}/boards/": 2,
+    "GET /users/{telegram_id}/boards/ (304)": 1,
+    "GET /boards/{board_id}": 1,
+    "POST /users/{telegram_id}/items/": 2,
+    "PUT /items/{item_id}/move/{board_id}": 4,
+    "POST /users/{telegram_id}/items/with-boards": 3,
+    # альбом с медиа: upsert в media и вставка элементов — по одному выражению на любое число файлов
+    "POST /users/{telegram_id}/items/bulk": 2,
+    "PUT /items/move/{board_id}": 2,
+    "GET /boards/{board_id}/items/": 2,
+    "GET /boards/{board_id}/view": 1,
+    "GET /users/{telegram_id}/search/": 1,
+    "GET /users/{telegram_id}/storage": 2,
+    "GET /items/{item_id}": 1,
+    "DELETE /items/{item_id}": 3,
+    "DELETE /boards/{board_id}": 4,
+}
+
+async def run():
+    import httpx
+    from app import models
+    from app.database import async_engine, engine
+    from app.main import app
+
+    models.Base.metadata.create_all(engine)
+
+    counts = {}
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://api") as client:
+        async def call(name, method, url, **kwargs):
+            with QueryCounter(async_engine.sync_engine) as counter:
+                response = await client.request(method, url, **kwargs)
+            if response.status_code >= 400: response.raise_for_status()
+            counts[name] = counter.count
+            return response
+
+        telegram_id = 1001
+        await call("POST /users/", "POST", "/users/", json={"telegram_id": telegram_id})
+        board = (await call("POST /users/{telegram_id}/boards/", "POST", f"/users/{telegram_id}/boards/", json={"name": "Доска"})).json()
+        await call("GET /users/{telegram_id}", "GET", f"/users/{telegram_id}")
+        boards = await call("GET /users/{telegram_id}/boards/", "GET", f"/users/{telegram_id}/boards/")
+        await call("GET /users/{telegram_id}/boards/ (304)", "GET", f"/users/{telegram_id}/boards/", headers={"If-None-Match": boards.headers["etag"]})
+        await call("GET /boards/{board_id}", "GET", f"/boards/{board['id']}")
+        item = (await call("POST /users/{telegram_id}/items/", "POST", f"/users/{telegram_id}/items/", json={"item_type": "text", "title": "Заметка", "content": "текст"})).json()
+        await call("POST /users/{telegram_id}/items/with-boards", "POST", f"/users/{telegram_id}/items/with-boards", json={"item_type": "text", "title": "Ещё заметка", "content": "текст"})
+        await call("PUT /items/{item_id}/move/{board_id}", "PUT", f"/items/{item['id']}/move/{board['id']}")
+        album = (await call("POST /users/{telegram_id}/items/bulk", "POST", f"/users/{telegram_id}/items/bulk", json={"items": [{"item_type": "photo", "title": "Фото", "content": f"file-{n}", "media": {"file_unique_id": f"unique-{n}", "file_size": 1024}} for n in range(5)]})).json()
+        await call("PUT /items/move/{board_id}", "PUT", f"/items/move/{board['id']}", json={"item_ids": [row["id"] for row in album]})
+        await call("GET /boards/{board_id}/items/", "GET", f"/boards/{board['id']}/items/")
+        await call("GET /boards/{board_id}/view", "GET", f"/boards/{board['id']}/view", params={"limit": 10})
+        await call("GET /users/{telegram_id}/search/", "GET", f"/users/{telegram_id}/search/", params={"q": "замет"})
+        await call("GET /users/{telegram_id}/storage", "GET", f"/users/{telegram_id}/storage")
+        await call("GET /items/{item_id}", "GET", f"/items/{item['id']}")
+        await call("DELETE /items/{item_id}", "DELETE", f"/items/{item['id']}")
+        await call("DELETE /boards/{board_id}", "DELETE", f"/boards/{board['id']}")
+    await async_engine.dispose()
+
+    failed = False
+    for name, budget in QUERY_BUDGETS.items():
+        count = counts.get(name)
+        status = "ok" if count is not None and count <= budget else "FAIL"
+        failed |= status == "FAIL"
+        print(f"{status:4} {name}: {count} SQL (budget {budget})")
+    return failed
+
+def main():
+    with tempfile.TemporaryDirectory() as directory:
+        os.environ["DATABASE_URL"] = f"sqlite:///{directory}/query_counts.db"
+        failed = asyncio.run(run())
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
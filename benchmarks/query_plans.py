@@ -0,0 +1,113 @@
+"""Планы запросов и задержки горячих путей API на синтетических данных.
+
+Заполняет отдельную базу пользователями, досками и элементами, затем для каждого эндпоинта
+выполняет соответствующие запросы crud, печатает их EXPLAIN и задержки p50/p99:
+
+    python -m benchmarks.query_plans --database-url sqlite:///./bench.db --users 200 --boards 5 --items 100
+"""
+import argparse
+import asyncio
+import os
+import random
+import time
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--database-url", default="sqlite:///./bench.db")
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--boards", type=int, default=5, help="досок на пользователя")
+    parser.add_argument("--items", type=int, default=100, help="элементов на доску")
+    parser.add_argument("--repeat", type=int, default=200, help="замеров на эндпоинт")
+    parser.add_argument("--reset", action="store_true", help="пересоздать таблицы перед заполнением")
+    parser.add_argument("--seed", type=int, default=42)
+    return parser.parse_args()
+
+def percentile(samples, q):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, round(q * (len(ordered) - 1)))]
+
+WORDS = ["идея", "проект", "рецепт", "статья", "ссылка", "музыка", "фильм", "книга", "заметка", "план"]
+
+def seed(db, models, args, rnd):
+    from sqlalchemy import insert, select
+    if db.scalar(select(models.User.id).limit(1)) is not None: return
+    db.execute(insert(models.User), [{"telegram_id": 10_000_000 + n, "username": f"bench{n}"} for n in range(args.users)])
+    user_ids = db.scalars(select(models.User.id).order_by(models.User.id)).all()
+    db.execute(insert(models.Board), [{"name": f"Доска {n}", "emoji_icon": "📁", "owner_id": user_id} for user_id in user_ids for n in range(args.boards)])
+    boards = db.execute(select(models.Board.id, models.Board.owner_id)).all()
+    batch = []
+    for board_id, owner_id in boards:
+        for _ in range(args.items):
+            title = " ".join(rnd.sample(WORDS, 3))
+            batch.append({"item_type": "text", "title": title, "content": f"{title} {rnd.random()}", "owner_id": owner_id, "board_id": board_id})
+            if len(batch) >= 5000:
+                db.execute(insert(models.Item), batch)
+                batch = []
+    if batch: db.execute(insert(models.Item), batch)
+    db.commit()
+
+async def run(args):
+    from sqlalchemy import event, func, select
+    from app import crud, models
+    from app.database import AsyncSessionLocal, SessionLocal, async_engine, engine
+
+    rnd = random.Random(args.seed)
+    if args.reset: models.Base.metadata.drop_all(engine)
+    models.Base.metadata.create_all(engine)
+    with SessionLocal() as sync_db:
+        started = time.perf_counter()
+        seed(sync_db, models, args, rnd)
+        print(f"dataset: {sync_db.scalar(select(func.count(models.Item.id)))} items, seeded/checked in {time.perf_counter() - started:.1f}s")
+        telegram_ids = sync_db.scalars(select(models.User.telegram_id)).all()
+        board_ids = sync_db.scalars(select(models.Board.id)).all()
+        max_item_id = sync_db.scalar(select(func.max(models.Item.id)))
+
+    db = AsyncSessionLocal()
+    async def user_boards():
+        user = await crud.get_user_by_telegram_id(db, telegram_id=rnd.choice(telegram_ids))
+        await crud.get_boards_by_user(db, user_id=user.id)
+    async def board_items():
+        await crud.get_items_page(db, board_id=rnd.choice(board_ids), limit=50)
+    async def search():
+        user = await crud.get_user_by_telegram_id(db, telegram_id=rnd.choice(telegram_ids))
+        await crud.search_items(db, user_id=user.id, query=rnd.choice(WORDS)[:4])
+    async def read_item():
+        await crud.get_item_by_id(db, item_id=rnd.randint(1, max_item_id))
+
+    cases = {
+        "GET /users/{telegram_id}/boards/": user_boards,
+        "GET /boards/{board_id}/items/": board_items,
+        "GET /users/{telegram_id}/search/": search,
+        "GET /items/{item_id}": read_item,
+    }
+    explain_prefix = {"postgresql": "EXPLAIN (ANALYZE, BUFFERS) ", "sqlite": "EXPLAIN QUERY PLAN "}.get(async_engine.dialect.name)
+    for name, case in cases.items():
+        statements = []
+        def capture(conn, cursor, statement, parameters, context, executemany):
+            statements.append((statement, parameters))
+        event.listen(async_engine.sync_engine, "before_cursor_execute", capture)
+        await case()
+        event.remove(async_engine.sync_engine, "before_cursor_execute", capture)
+        timings = []
+        for _ in range(args.repeat):
+            started = time.perf_counter()
+            await case()
+            timings.append((time.perf_counter() - started) * 1000)
+            db.expunge_all()
+        print(f"\n=== {name}: p50 {percentile(timings, 0.5):.2f} ms, p99 {percentile(timings, 0.99):.2f} ms, {len(statements)} SQL")
+        if not explain_prefix: continue
+        connection = await db.connection()
+        for statement, parameters in statements:
+            print(f"-- {' '.join(statement.split())}")
+            for row in await connection.exec_driver_sql(explain_prefix + statement, parameters):
+                print("   ", " ".join(str(value) for value in row))
+    await db.close()
+    await async_engine.dispose()
+
+def main():
+    args = parse_args()
+    os.environ["DATABASE_URL"] = args.database_url
+    asyncio.run(run(args))
+
+if __name__ == "__main__":
+    main()
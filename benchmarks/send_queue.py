@@ -0,0 +1,122 @@
+"""Проверка планировщика исходящих сообщений против заглушки Bot API с flood control.
+
+Заглушка, как и Telegram, отвечает RetryAfter, если бот превышает общий лимит или лимит чата.
+Прогон шлёт пачку сообщений по нескольким чатам, посреди неё — ответы на callback-запросы и серию
+правок одного сообщения, и печатает JSON: фактические скорости, задержки по приоритетам,
+число RetryAfter и сколько правок ушло в сеть:
+
+    python -m benchmarks.send_queue --messages 120 --chats 30
+"""
+import argparse
+import asyncio
+import json
+import time
+from collections import Counter, defaultdict, deque
+
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import AnswerCallbackQuery, EditMessageText
+
+from benchmarks.query_plans import percentile
+from benchmarks.telegram_stub import StubSession
+
+class FloodStubSession(StubSession):
+    """StubSession с лимитами Telegram: не больше `rate` вызовов на бота и `chat_limit` на чат в любом окне в секунду."""
+
+    def __init__(self, rate: float = 30, chat_limit: int = 3, **kwargs):
+        super().__init__(**kwargs)
+        self.rate = rate
+        self.chat_limit = chat_limit
+        self.sent = deque()
+        self.sent_by_chat = defaultdict(deque)
+        self.timeline = []
+        self.flood_errors = 0
+
+    async def make_request(self, bot, method, timeout=None):
+        now = time.monotonic()
+        chat_id = getattr(method, "chat_id", None)
+        if not isinstance(method, AnswerCallbackQuery):
+            while self.sent and now - self.sent[0] >= 1: self.sent.popleft()
+            chat_window = self.sent_by_chat[chat_id]
+            while chat_window and now - chat_window[0] >= 1: chat_window.popleft()
+            if len(self.sent) >= self.rate or (chat_id is not None and len(chat_window) >= self.chat_limit):
+                self.flood_errors += 1
+                raise TelegramRetryAfter(method=method, message="Too Many Requests", retry_after=1)
+            self.sent.append(now)
+            if chat_id is not None: chat_window.append(now)
+        self.timeline.append((now, method.__api_method__, chat_id))
+        return await super().make_request(bot, method, timeout)
+
+def max_window_rate(timestamps, window: float = 1.0):
+    timestamps, best, start = sorted(timestamps), 0, 0
+    for end, stamp in enumerate(timestamps):
+        while stamp - timestamps[start] > window: start += 1
+        best = max(best, end - start + 1)
+    return best
+
+async def run(args):
+    from aiogram import Bot
+    from botcore.sender import OutboundScheduler
+
+    session = FloodStubSession(rate=args.rate)
+    scheduler = None
+    if not args.unthrottled:
+        scheduler = OutboundScheduler(rate=args.rate, chat_rate=args.chat_rate, max_retries=args.max_retries)
+        session.middleware(scheduler)
+    bot = Bot(token="123456:stub-token", session=session)
+    latencies = defaultdict(list)
+    errors = Counter()
+
+    async def timed(kind, call):
+        started = time.perf_counter()
+        try: await call
+        except TelegramRetryAfter: errors[kind] += 1
+        latencies[kind].append((time.perf_counter() - started) * 1000)
+
+    async def answers():
+        # Нажатия кнопок приходят, когда очередь уже забита рассылкой
+        await asyncio.sleep(0.2)
+        await asyncio.gather(*(timed("answer", bot(AnswerCallbackQuery(callback_query_id=str(n)))) for n in range(args.answers)))
+
+    async def edits():
+        await asyncio.sleep(0.1)
+        chat_id = 1_000_000
+        await asyncio.gather(*(timed("edit", bot(EditMessageText(chat_id=chat_id, message_id=1, text=f"Шаг {n}"))) for n in range(args.edits)))
+
+    sends = (timed("send", bot.send_message(chat_id=n % args.chats + 1, text=f"Сообщение {n}")) for n in range(args.messages))
+    started = time.perf_counter()
+    await asyncio.gather(*sends, answers(), edits())
+    elapsed = time.perf_counter() - started
+
+    sent_stamps = [stamp for stamp, name, _ in session.timeline if name != "answerCallbackQuery"]
+    by_chat = defaultdict(list)
+    for stamp, name, chat_id in session.timeline:
+        if name != "answerCallbackQuery": by_chat[chat_id].append(stamp)
+    return {
+        "mode": "unthrottled" if args.unthrottled else "scheduler",
+        "elapsed_s": round(elapsed, 2),
+        "limits": {"rate": args.rate, "chat_rate": args.chat_rate},
+        "max_sent_per_second": max_window_rate(sent_stamps),
+        "max_sent_per_chat_second": max((max_window_rate(stamps) for stamps in by_chat.values()), default=0),
+        "flood_errors_from_api": session.flood_errors,
+        "failed_calls": dict(errors),
+        "edits_requested": args.edits,
+        "edits_sent": sum(1 for _, name, _ in session.timeline if name == "editMessageText"),
+        "coalesced_edits": scheduler.coalesced if scheduler else 0,
+        "latency_ms": {kind: {"p50": round(percentile(values, 0.5), 1), "p95": round(percentile(values, 0.95), 1), "max": round(max(values), 1)} for kind, values in latencies.items()},
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=120)
+    parser.add_argument("--chats", type=int, default=30)
+    parser.add_argument("--answers", type=int, default=10)
+    parser.add_argument("--edits", type=int, default=10)
+    parser.add_argument("--rate", type=float, default=30)
+    parser.add_argument("--chat-rate", type=float, default=1)
+    parser.add_argument("--max-retries", type=int, default=3)
+    parser.add_argument("--unthrottled", action="store_true", help="без планировщика — для сравнения")
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(run(args)), ensure_ascii=False, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,28 @@
+from aiogram.client.session.base import BaseSession
+from aiogram.methods import GetChat, GetFile
+from aiogram.types import ChatFullInfo, File
+
+class StubSession(BaseSession):
+    """Сессия aiogram без сети: запоминает вызовы Bot API и отвечает заглушками.
+
+    GetFile и GetChat возвращают правдоподобные объекты, остальные методы — True.
+    """
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.calls = []
+
+    async def make_request(self, bot, method, timeout=None):
+        self.calls.append(method)
+        if isinstance(method, GetFile):
+            return File(file_id=method.file_id, file_unique_id=method.file_id[-16:], file_path=f"stub/{method.file_id}")
+        if isinstance(method, GetChat):
+            # model_construct: обязательные поля ChatFullInfo меняются от версии к версии Bot API
+            return ChatFullInfo.model_construct(id=sum(map(ord, str(method.chat_id))), type="private")
+        return True
+
+    async def stream_content(self, url, headers=None, timeout=30, chunk_size=65536, raise_for_status=True):
+        yield b""
+
+    async def close(self):
+        pass
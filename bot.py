@@ -2,7 +2,6 @@ import asyncio
 import os
 import logging
 from dotenv import load_dotenv
-import aiohttp
 from aiogram import Bot, Dispatcher, F, types
 from aiogram.filters import Command, CommandStart, StateFilter
 from aiogram.fsm.context import FSMContext
@@ -10,27 +9,54 @@ from aiogram.fsm.state import State, StatesGroup
 from aiogram.types import Message, CallbackQuery, InlineKeyboardButton, ReplyKeyboardMarkup, KeyboardButton
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 import urllib.parse
+from dataclasses import replace
+from datetime import timedelta
+from aiohttp import web
+
+from botcore.api import ApiClient
+from botcore.metrics import create_metrics_app, instrument_bot
+from botcore.sender import OutboundScheduler
+from botcore.pipeline import UpdatePipeline, create_webhook_app
+from botcore.storage import create_storage
 
 load_dotenv()
-API_BASE_URL = "http://127.0.0.1:8000"
+API_BASE_URL = os.getenv("API_BASE_URL", "http://127.0.0.1:8000")
 BOT_TOKEN = os.getenv("BOT_TOKEN")
+# polling — по умолчанию; webhook — приём апдейтов по HTTP (нужен публичный WEBHOOK_URL)
+BOT_MODE = os.getenv("BOT_MODE", "polling")
+WEBHOOK_URL = os.getenv("WEBHOOK_URL", "")
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/webhook")
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET")
+# В режиме webhook /metrics отдаёт сервер вебхука; для polling — отдельный порт, если задан
+METRICS_PORT = os.getenv("METRICS_PORT")
 logging.basicConfig(level=logging.INFO)
 
 bot = Bot(token=BOT_TOKEN)
-dp = Dispatcher()
+storage = create_storage(os.getenv("FSM_STORAGE", "memory"), ttl=timedelta(seconds=int(os.getenv("FSM_TTL", "86400"))))
+dp = Dispatcher(storage=storage)
+# Планировщик регистрируется первым (внешний слой): метрики Telegram измеряют сам вызов, без ожидания в очереди
+bot.session.middleware(OutboundScheduler(rate=float(os.getenv("SEND_RATE", "30")), chat_rate=float(os.getenv("SEND_CHAT_RATE", "1"))))
+instrument_bot(bot, dp)
+api = ApiClient(
+    API_BASE_URL,
+    pool_size=int(os.getenv("API_POOL_SIZE", "20")),
+    timeout=float(os.getenv("API_TIMEOUT", "10")),
+    retries=int(os.getenv("API_RETRIES", "2")),
+    in_process=os.getenv("API_IN_PROCESS", "0") == "1",
+)
+
+SEARCH_LIMIT = 20
+# Повторно присланный файл: link — сохранить ещё раз (метаданные файла общие), skip — не дублировать
+MEDIA_DUPLICATES = os.getenv("MEDIA_DUPLICATES", "link")
+BOARD_PAGE_SIZE = 10
+ALBUM_WAIT = 1.0
 
 class BoardCreation(StatesGroup): waiting_for_name = State(); waiting_for_emoji = State()
 class ItemSaving(StatesGroup): waiting_for_title = State()
 class SearchState(StatesGroup): waiting_for_query = State()
 
 async def api_request(method, url, **kwargs):
-    async with aiohttp.ClientSession() as session:
-        async with session.request(method, f"{API_BASE_URL}{url}", **kwargs) as response:
-            if 200 <= response.status < 300:
-                try: return await response.json()
-                except aiohttp.ContentTypeError: return {"ok": True}
-            logging.error(f"API Error: {response.status} on {method} {url}")
-            return None
+    return await api.request(method, url, **kwargs)
 
 async def generate_boards_menu(user_id: int, mode: str):
     boards = await api_request("get", f"/users/{user_id}/boards/")
@@ -44,16 +70,19 @@ async def generate_boards_menu(user_id: int, mode: str):
 
 async def process_and_save_item(message: Message, final_item_data: dict):
     user_id = message.from_user.id
-    item = await api_request("post", f"/users/{user_id}/items/", json=final_item_data)
-    if not item: return await message.answer("❌ Не удалось сохранить элемент.")
-    item_id = item['id']
-    boards = await api_request("get", f"/users/{user_id}/boards/")
-    if not boards: return await message.answer(f"✅ Сохранено в 'неотсортированное'.\nСоздайте доски, нажав '✨ Создать доску'")
+    saved = await api_request("post", f"/users/{user_id}/items/with-boards", params={"on_duplicate": MEDIA_DUPLICATES}, json=final_item_data)
+    if not saved: return await message.answer("❌ Не удалось сохранить элемент.")
+    item_id, boards = saved['item']['id'], saved['boards']
+    if saved.get('duplicate'):
+        if not boards: return await message.answer("☑️ Этот файл уже сохранён.")
+        header = "☑️ Этот файл уже сохранён. Переместить в другую доску?"
+    elif not boards: return await message.answer(f"✅ Сохранено в 'неотсортированное'.\nСоздайте доски, нажав '✨ Создать доску'")
+    else: header = "✅ Сохранено! Куда добавить?"
     builder = InlineKeyboardBuilder()
     for board in boards:
         builder.add(InlineKeyboardButton(text=f"{board.get('emoji_icon', '📁')} {board['name']}", callback_data=f"move_item:{item_id}:{board['id']}"))
     builder.adjust(2)
-    await message.answer("✅ Сохранено! Куда добавить?", reply_markup=builder.as_markup())
+    await message.answer(header, reply_markup=builder.as_markup())
 
 @dp.message(CommandStart())
 async def handle_start(message: Message, state: FSMContext):
@@ -104,7 +133,7 @@ async def process_search_query(message: Message, state: FSMContext):
         await handle_start(message, state)
         return
     safe_query = urllib.parse.quote(query)
-    results = await api_request("get", f"/users/{message.from_user.id}/search/?q={safe_query}")
+    results = await api_request("get", f"/users/{message.from_user.id}/search/?q={safe_query}&limit={SEARCH_LIMIT}")
     
     # СНАЧАЛА отправляем результаты или сообщение об их отсутствии
     if not results:
@@ -147,34 +176,81 @@ async def process_item_title(message: Message, state: FSMContext):
     user_data = await state.get_data()
     item_data = user_data['item_data']
     title = message.text if message.text != "." else item_data['title']
-    final_item_data = {"item_type": item_data['item_type'], "title": title, "content": item_data['content']}
+    final_item_data = {"item_type": item_data['item_type'], "title": title, "content": item_data['content'], "media": item_data.get('media')}
     await state.clear()
     await process_and_save_item(message, final_item_data)
     await handle_start(message, state)
 
+def media_info(file, **extra):
+    # Метаданные файла для дедупликации на стороне API (таблица media, ключ file_unique_id)
+    return {"file_unique_id": file.file_unique_id, "file_size": file.file_size, **extra}
+
+def extract_item_data(message: Message):
+    if message.text: return {'item_type': 'text', 'title': message.text[:50], 'content': message.text}
+    elif message.photo: return {'item_type': 'photo', 'title': "Фотография", 'content': message.photo[-1].file_id, 'media': media_info(message.photo[-1])}
+    elif message.video: return {'item_type': 'video', 'title': f"Видео ({message.video.duration} сек.)", 'content': message.video.file_id, 'media': media_info(message.video, duration=message.video.duration, mime_type=message.video.mime_type)}
+    elif message.voice: return {'item_type': 'voice', 'title': f"Голосовое ({message.voice.duration} сек.)", 'content': message.voice.file_id, 'media': media_info(message.voice, duration=message.voice.duration, mime_type=message.voice.mime_type)}
+    elif message.document: return {'item_type': 'document', 'title': f"Документ: {message.document.file_name}", 'content': message.document.file_id, 'media': media_info(message.document, mime_type=message.document.mime_type)}
+    elif message.video_note: return {'item_type': 'video_note', 'title': "Видеосообщение", 'content': message.video_note.file_id, 'media': media_info(message.video_note, duration=message.video_note.duration)}
+    elif message.location: return {'item_type': 'location', 'title': "Геометка", 'content': f"{message.location.latitude},{message.location.longitude}"}
+    return {}
+
+# Части альбома (media_group_id) приходят отдельными сообщениями почти одновременно:
+# копим их и сохраняем одним запросом, когда поток частей затих на ALBUM_WAIT секунд.
+# Буфер — в памяти процесса: если апдейты одного вебхука делят несколько реплик бота, части альбома,
+# попавшие на разные реплики, сохранятся отдельными альбомами. Для склейки альбомов держите одну
+# реплику на вебхук (масштабируйте через BOT_CONCURRENCY) — общее FSM-хранилище здесь не поможет.
+album_buffer = {}
+album_tasks = {}
+
+def album_state(state: FSMContext, media_group_id: str) -> FSMContext:
+    # У каждого альбома свой ключ хранилища: кнопки под альбомом A двигают именно A,
+    # а state.clear() сценариев (/start, /cancel, поиск) его не стирает.
+    return FSMContext(storage=state.storage, key=replace(state.key, destiny=f"album:{media_group_id}"))
+
+async def flush_album(media_group_id: str, state: FSMContext):
+    await asyncio.sleep(ALBUM_WAIT)
+    album_tasks.pop(media_group_id, None)
+    messages = sorted(album_buffer.pop(media_group_id, []), key=lambda m: m.message_id)
+    if not messages: return
+    first = messages[0]
+    items_payload = [data for data in map(extract_item_data, messages) if data]
+    # Доски не зависят от сохранения — запрашиваем параллельно
+    items, boards = await asyncio.gather(
+        api_request("post", f"/users/{first.from_user.id}/items/bulk", params={"on_duplicate": MEDIA_DUPLICATES}, json={"items": items_payload}),
+        api_request("get", f"/users/{first.from_user.id}/boards/"),
+    )
+    if not items: return await first.answer("❌ Не удалось сохранить альбом.")
+    await album_state(state, media_group_id).set_data({"item_ids": [item['id'] for item in items]})
+    if not boards: return await first.answer(f"✅ Сохранено элементов: {len(items)} в 'неотсортированное'.")
+    builder = InlineKeyboardBuilder()
+    for board in boards:
+        builder.add(InlineKeyboardButton(text=f"{board.get('emoji_icon', '📁')} {board['name']}", callback_data=f"move_album:{media_group_id}:{board['id']}"))
+    builder.adjust(2)
+    await first.answer(f"✅ Сохранено элементов: {len(items)}! Куда добавить?", reply_markup=builder.as_markup())
+
+def collect_album_part(message: Message, state: FSMContext):
+    media_group_id = message.media_group_id
+    album_buffer.setdefault(media_group_id, []).append(message)
+    pending = album_tasks.get(media_group_id)
+    if pending: pending.cancel()
+    album_tasks[media_group_id] = asyncio.create_task(flush_album(media_group_id, state))
+
 @dp.message(StateFilter(None), F.photo | F.video | F.voice | F.document | F.video_note | F.location | F.text)
 async def handle_any_content(message: Message, state: FSMContext):
-    item_data = {}
-    if message.text:
-        if message.text in ["🧐 Просмотр досок", "✨ Создать доску", "✏️ Управление", "🔍 Поиск"]: return
-        item_data = {'item_type': 'text', 'title': message.text[:50], 'content': message.text}
-    elif message.photo: item_data = {'item_type': 'photo', 'title': "Фотография", 'content': message.photo[-1].file_id}
-    elif message.video: item_data = {'item_type': 'video', 'title': f"Видео ({message.video.duration} сек.)", 'content': message.video.file_id}
-    elif message.voice: item_data = {'item_type': 'voice', 'title': f"Голосовое ({message.voice.duration} сек.)", 'content': message.voice.file_id}
-    elif message.document: item_data = {'item_type': 'document', 'title': f"Документ: {message.document.file_name}", 'content': message.document.file_id}
-    elif message.video_note: item_data = {'item_type': 'video_note', 'title': "Видеосообщение", 'content': message.video_note.file_id}
-    elif message.location: item_data = {'item_type': 'location', 'title': "Геометка", 'content': f"{message.location.latitude},{message.location.longitude}"}
+    if message.text in ["🧐 Просмотр досок", "✨ Создать доску", "✏️ Управление", "🔍 Поиск"]: return
+    if message.media_group_id: return collect_album_part(message, state)
+    item_data = extract_item_data(message)
     if not item_data: return
     await state.set_state(ItemSaving.waiting_for_title)
     await state.update_data(item_data=item_data)
     await message.answer(f"Принято! Введите название или отправьте '.', чтобы использовать: '{item_data['title']}'", reply_markup=types.ReplyKeyboardRemove())
 
-@dp.callback_query(F.data.startswith("view_board:"))
-async def cb_show_board_contents(callback: CallbackQuery):
-    board_id = callback.data.split(":")[1]
-    items = await api_request("get", f"/boards/{board_id}/items/")
-    board_info = await api_request("get", f"/boards/{board_id}")
-    board_name = board_info.get('name', '') if board_info else ''
+async def render_board(board_id, params=None):
+    # Экран доски: доска и страница элементов одним запросом к API.
+    view = await api_request("get", f"/boards/{board_id}/view", params={"limit": BOARD_PAGE_SIZE, **(params or {})})
+    board_name = view['board'].get('name', '') if view else ''
+    items = view['items'] if view else []
     builder = InlineKeyboardBuilder()
     if not items: builder.add(InlineKeyboardButton(text="В этой доске пока пусто", callback_data="do_nothing"))
     else:
@@ -182,8 +258,19 @@ async def cb_show_board_contents(callback: CallbackQuery):
             title = (item['title'][:40] + '..') if len(item['title']) > 40 else item['title']
             builder.add(InlineKeyboardButton(text=f"▪️ {title}", callback_data=f"manage_item:{item['id']}:{board_id}"))
     builder.adjust(1)
+    nav = []
+    if view and view.get('prev_cursor'): nav.append(InlineKeyboardButton(text="◀️", callback_data=f"view_board:{board_id}:before:{view['prev_cursor']}"))
+    if view and view.get('next_cursor'): nav.append(InlineKeyboardButton(text="▶️", callback_data=f"view_board:{board_id}:after:{view['next_cursor']}"))
+    if nav: builder.row(*nav)
     builder.row(InlineKeyboardButton(text="⬅️ Назад к списку досок", callback_data="back_to_view_list"))
-    await callback.message.edit_text(f"Содержимое доски «{board_name}»:", reply_markup=builder.as_markup())
+    return f"Содержимое доски «{board_name}»:", builder.as_markup()
+
+@dp.callback_query(F.data.startswith("view_board:"))
+async def cb_show_board_contents(callback: CallbackQuery):
+    # view_board:<board_id>[:after|before:<cursor>]
+    parts = callback.data.split(":")
+    text, markup = await render_board(parts[1], {parts[2]: parts[3]} if len(parts) == 4 else None)
+    await callback.message.edit_text(text, reply_markup=markup)
     await callback.answer()
 
 @dp.callback_query(F.data.startswith("manage_item:"))
@@ -200,9 +287,10 @@ async def cb_delete_item(callback: CallbackQuery):
     _, item_id, board_id = callback.data.split(":")
     result = await api_request("delete", f"/items/{item_id}")
     if result and result.get("ok"):
-        await callback.answer("✅ Элемент удален!", show_alert=True)
-        callback.data = f"view_board:{board_id}"
-        await cb_show_board_contents(callback)
+        # Уведомление и обновлённая доска не зависят друг от друга — запрашиваем одновременно
+        # (answer() возвращает объект метода, а gather нужна корутина — её даёт вызов бота)
+        _, (text, markup) = await asyncio.gather(callback.bot(callback.answer("✅ Элемент удален!", show_alert=True)), render_board(board_id))
+        await callback.message.edit_text(text, reply_markup=markup)
     else: await callback.answer("❌ Ошибка при удалении.", show_alert=True)
 
 @dp.callback_query(F.data == "back_to_view_list")
@@ -260,9 +348,48 @@ async def cb_move_item(callback: CallbackQuery):
     else: await callback.message.edit_text("❌ Ошибка! Не удалось переместить элемент.")
     await callback.answer()
 
+@dp.callback_query(F.data.startswith("move_album:"))
+async def cb_move_album(callback: CallbackQuery, state: FSMContext):
+    _, media_group_id, board_id = callback.data.split(":")
+    album = album_state(state, media_group_id)
+    item_ids = (await album.get_data()).get('item_ids')
+    if item_ids and await api_request("put", f"/items/move/{board_id}", json={"item_ids": item_ids}):
+        await album.clear()
+        await callback.message.edit_text("✅ Готово! Альбом перемещен.")
+    else: await callback.message.edit_text("❌ Ошибка! Не удалось переместить альбом.")
+    await callback.answer()
+
+async def run_webhook():
+    pipeline = UpdatePipeline(dp, bot, concurrency=int(os.getenv("BOT_CONCURRENCY", "32")), max_pending=int(os.getenv("BOT_MAX_PENDING", "1000")))
+    await pipeline.start()
+    runner = web.AppRunner(create_webhook_app(bot, pipeline, path=WEBHOOK_PATH, secret=WEBHOOK_SECRET))
+    await runner.setup()
+    await web.TCPSite(runner, os.getenv("WEBHOOK_HOST", "0.0.0.0"), int(os.getenv("WEBHOOK_PORT", "8080"))).start()
+    try:
+        await bot.set_webhook(f"{WEBHOOK_URL}{WEBHOOK_PATH}", secret_token=WEBHOOK_SECRET, allowed_updates=dp.resolve_used_update_types(), drop_pending_updates=True)
+        await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()
+        await pipeline.stop()
+
 async def main():
-    await bot.delete_webhook(drop_pending_updates=True)
-    await dp.start_polling(bot)
+    await api.start()
+    purger = asyncio.create_task(storage.run_purger()) if hasattr(storage, "run_purger") else None
+    metrics_runner = None
+    try:
+        if BOT_MODE == "webhook":
+            await run_webhook()
+        else:
+            if METRICS_PORT:
+                metrics_runner = web.AppRunner(create_metrics_app())
+                await metrics_runner.setup()
+                await web.TCPSite(metrics_runner, os.getenv("WEBHOOK_HOST", "0.0.0.0"), int(METRICS_PORT)).start()
+            await bot.delete_webhook(drop_pending_updates=True)
+            await dp.start_polling(bot)
+    finally:
+        if metrics_runner: await metrics_runner.cleanup()
+        if purger: purger.cancel()
+        await api.close()
 
 if __name__ == "__main__":
     asyncio.run(main())
\ No newline at end of file
@@ -0,0 +1,98 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+import aiohttp
+
+from botcore.metrics import BOT_API_SECONDS
+
+RETRY_STATUSES = {500, 502, 503, 504}
+IDEMPOTENT_METHODS = {"get", "put", "delete", "head", "options"}
+
+class ApiClient:
+    """Долгоживущий клиент к API с пулом keep-alive соединений.
+
+    Открывается один раз при старте бота (`start`) и закрывается при остановке (`close`).
+    При `in_process=True` запросы идут напрямую в FastAPI-приложение через ASGI, минуя TCP.
+    """
+
+    def __init__(self, base_url: str, pool_size: int = 20, timeout: float = 10.0, retries: int = 2, backoff: float = 0.2, in_process: bool = False):
+        self.base_url = base_url.rstrip("/")
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.in_process = in_process
+        self._session = None
+        self._asgi_client = None
+        self._lifespan = None
+        # Ответы GET с ETag: при повторном запросе шлём If-None-Match и на 304 отдаём сохранённое.
+        self._etag_cache = OrderedDict()
+        self.etag_cache_size = 512
+
+    async def start(self):
+        if self.in_process:
+            import httpx
+            from app.main import app
+            # ASGITransport не запускает lifespan: поднимаем его сами (пул БД, Bot, воркеры задач)
+            self._lifespan = app.router.lifespan_context(app)
+            await self._lifespan.__aenter__()
+            self._asgi_client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://api", timeout=self.timeout)
+        else:
+            connector = aiohttp.TCPConnector(limit=self.pool_size, keepalive_timeout=60)
+            self._session = aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=self.timeout))
+
+    async def close(self):
+        if self._session: await self._session.close()
+        if self._asgi_client: await self._asgi_client.aclose()
+        if self._lifespan: await self._lifespan.__aexit__(None, None, None)
+        self._session = self._asgi_client = self._lifespan = None
+
+    async def _send(self, method, url, **kwargs):
+        if self._asgi_client:
+            response = await self._asgi_client.request(method.upper(), url, **kwargs)
+            etag = response.headers.get("etag")
+            if response.status_code == 304 or not response.content: return response.status_code, {"ok": True}, etag
+            try: return response.status_code, response.json(), etag
+            except ValueError: return response.status_code, {"ok": True}, etag
+        async with self._session.request(method, f"{self.base_url}{url}", **kwargs) as response:
+            etag = response.headers.get("ETag")
+            if response.status == 304: return response.status, {"ok": True}, etag
+            try: return response.status, await response.json(), etag
+            except aiohttp.ContentTypeError: return response.status, {"ok": True}, etag
+
+    def _remember(self, key, etag, data):
+        self._etag_cache[key] = (etag, data)
+        self._etag_cache.move_to_end(key)
+        while len(self._etag_cache) > self.etag_cache_size:
+            self._etag_cache.popitem(last=False)
+
+    async def request(self, method, url, **kwargs):
+        if not self._session and not self._asgi_client: raise RuntimeError("ApiClient is not started")
+        # Неидемпотентные запросы (POST) повторяем только если соединение не установилось (запрос не ушёл):
+        # после таймаута, обрыва или 5xx сервер мог уже записать данные.
+        idempotent = method.lower() in IDEMPOTENT_METHODS
+        cache_key = None
+        if method.lower() == "get":
+            cache_key = (url, tuple(sorted((kwargs.get("params") or {}).items())))
+            cached = self._etag_cache.get(cache_key)
+            if cached: kwargs["headers"] = {**(kwargs.get("headers") or {}), "If-None-Match": cached[0]}
+        for attempt in range(self.retries + 1):
+            last_attempt = attempt == self.retries
+            started = time.perf_counter()
+            try:
+                status, data, etag = await self._send(method, url, **kwargs)
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+                BOT_API_SECONDS.observe(time.perf_counter() - started, method=method.upper(), status="error")
+                logging.warning(f"API connection error on {method} {url}: {e!r} (attempt {attempt + 1})")
+                if last_attempt or not (idempotent or isinstance(e, aiohttp.ClientConnectorError)): return None
+            else:
+                BOT_API_SECONDS.observe(time.perf_counter() - started, method=method.upper(), status=status)
+                if status == 304 and cache_key in self._etag_cache: return self._etag_cache[cache_key][1]
+                if 200 <= status < 300:
+                    if cache_key and etag: self._remember(cache_key, etag, data)
+                    return data
+                if status not in RETRY_STATUSES or not idempotent or last_attempt:
+                    logging.error(f"API Error: {status} on {method} {url}")
+                    return None
+            await asyncio.sleep(self.backoff * 2 ** attempt)
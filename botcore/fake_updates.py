@@ -0,0 +1,81 @@
+"""Генератор поддельных апдейтов Telegram для прогона вебхука без Telegram.
+
+    python -m botcore.fake_updates --url http://127.0.0.1:8080/webhook --count 1000 --chats 50
+"""
+import argparse
+import asyncio
+import itertools
+import random
+import time
+import aiohttp
+
+_update_ids = itertools.count(1)
+_message_ids = itertools.count(1)
+
+def _user(chat_id: int):
+    return {"id": chat_id, "is_bot": False, "first_name": f"User {chat_id}"}
+
+def fake_message_update(chat_id: int, text: str, update_id: int = None):
+    return {
+        "update_id": update_id or next(_update_ids),
+        "message": {
+            "message_id": next(_message_ids),
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private"},
+            "from": _user(chat_id),
+            "text": text,
+        },
+    }
+
+def fake_callback_update(chat_id: int, data: str, update_id: int = None):
+    return {
+        "update_id": update_id or next(_update_ids),
+        "callback_query": {
+            "id": str(next(_message_ids)),
+            "from": _user(chat_id),
+            "chat_instance": str(chat_id),
+            "data": data,
+            "message": {
+                "message_id": next(_message_ids),
+                "date": int(time.time()),
+                "chat": {"id": chat_id, "type": "private"},
+                "text": "menu",
+            },
+        },
+    }
+
+def generate_updates(count: int, chats: int, seed: int = 0):
+    rnd = random.Random(seed)
+    texts = ["🧐 Просмотр досок", "https://example.com/article", "заметка на потом"]
+    for _ in range(count):
+        chat_id = 100000 + rnd.randrange(chats)
+        if rnd.random() < 0.3: yield fake_callback_update(chat_id, "back_to_view_list")
+        else: yield fake_message_update(chat_id, rnd.choice(texts))
+
+async def send_updates(url: str, updates, secret: str = None, concurrency: int = 20):
+    """POST-ит апдейты на вебхук, возвращает счётчик ответов по статусу."""
+    statuses = {}
+    semaphore = asyncio.Semaphore(concurrency)
+    headers = {"X-Telegram-Bot-Api-Secret-Token": secret} if secret else {}
+    async with aiohttp.ClientSession() as session:
+        async def post(update):
+            async with semaphore, session.post(url, json=update, headers=headers) as response:
+                statuses[response.status] = statuses.get(response.status, 0) + 1
+        await asyncio.gather(*(post(update) for update in updates))
+    return statuses
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default="http://127.0.0.1:8080/webhook")
+    parser.add_argument("--count", type=int, default=1000)
+    parser.add_argument("--chats", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--secret")
+    args = parser.parse_args()
+    started = time.perf_counter()
+    statuses = asyncio.run(send_updates(args.url, generate_updates(args.count, args.chats), args.secret, args.concurrency))
+    elapsed = time.perf_counter() - started
+    print(f"sent {args.count} updates in {elapsed:.2f}s ({args.count / elapsed:.0f}/s), statuses: {statuses}")
+
+if __name__ == "__main__":
+    main()
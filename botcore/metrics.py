@@ -0,0 +1,47 @@
+import time
+from aiogram import BaseMiddleware
+from aiohttp import web
+
+from app.metrics import CONTENT_TYPE, REGISTRY, TelegramTimingMiddleware
+
+BOT_HANDLER_SECONDS = REGISTRY.histogram("bot_handler_duration_seconds", "Время работы обработчика бота", ("event", "handler", "outcome"))
+BOT_API_SECONDS = REGISTRY.histogram("bot_api_request_duration_seconds", "Время запроса бота к API (одна попытка)", ("method", "status"))
+BOT_SEND_WAIT_SECONDS = REGISTRY.histogram("bot_send_wait_seconds", "Ожидание исходящего вызова Telegram в планировщике", ("priority",))
+BOT_UPDATES_PENDING = REGISTRY.gauge("bot_updates_pending", "Необработанные апдейты вебхука")
+
+class HandlerTimingMiddleware(BaseMiddleware):
+    """Внутренний middleware событий: время обработчика по имени функции.
+
+    Регистрируется через `dp.message.middleware(...)` — он вызывается уже после фильтров,
+    когда обработчик выбран, поэтому в данных есть `handler`.
+    """
+
+    def __init__(self, event: str):
+        self.event = event
+
+    async def __call__(self, handler, event, data):
+        handler_object = data.get("handler")
+        name = getattr(getattr(handler_object, "callback", None), "__name__", "unknown")
+        started = time.perf_counter()
+        outcome = "ok"
+        try:
+            return await handler(event, data)
+        except Exception as e:
+            outcome = type(e).__name__
+            raise
+        finally:
+            BOT_HANDLER_SECONDS.observe(time.perf_counter() - started, event=self.event, handler=name, outcome=outcome)
+
+def instrument_bot(bot, dispatcher):
+    bot.session.middleware(TelegramTimingMiddleware())
+    for event in ("message", "callback_query"):
+        dispatcher.observers[event].middleware(HandlerTimingMiddleware(event))
+
+async def metrics_view(request: web.Request):
+    return web.Response(body=REGISTRY.render().encode(), headers={"Content-Type": CONTENT_TYPE})
+
+def create_metrics_app() -> web.Application:
+    """Отдельный HTTP-сервер с /metrics для режима polling, где вебхук-приложения нет."""
+    app = web.Application()
+    app.router.add_get("/metrics", metrics_view)
+    return app
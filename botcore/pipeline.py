@@ -0,0 +1,105 @@
+import asyncio
+import logging
+from collections import deque
+from aiogram import Bot, Dispatcher
+from aiogram.types import Update
+from aiohttp import web
+
+from botcore.metrics import BOT_UPDATES_PENDING, metrics_view
+
+def update_chat_key(update: Update) -> int:
+    """Ключ упорядочивания: id чата (или пользователя) апдейта, иначе update_id."""
+    try: event = update.event
+    except Exception: return update.update_id
+    chat = getattr(event, "chat", None) or getattr(getattr(event, "message", None), "chat", None)
+    if chat: return chat.id
+    user = getattr(event, "from_user", None)
+    return user.id if user else update.update_id
+
+class UpdatePipeline:
+    """Конкурентная обработка апдейтов с сохранением порядка внутри чата.
+
+    У каждого чата с необработанными апдейтами своя очередь и свой обработчик: очередь заводится
+    на первом апдейте и удаляется, как только чат опустел, поэтому медленный чат (или его лимит
+    исходящих сообщений) задерживает только себя. Одновременно обрабатывается не больше `concurrency`
+    апдейтов, а всего ожидающих — не больше `max_pending`; сверх этого `submit` возвращает False,
+    и вебхук отвечает Telegram ошибкой, чтобы тот повторил доставку позже.
+    """
+
+    def __init__(self, dispatcher: Dispatcher, bot: Bot, concurrency: int = 32, max_pending: int = 1000):
+        self.dispatcher = dispatcher
+        self.bot = bot
+        self.max_pending = max_pending
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._chats = {}
+        self._tasks = set()
+        self._pending = 0
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._accepting = False
+
+    def submit(self, update: Update) -> bool:
+        if not self._accepting or self._pending >= self.max_pending: return False
+        self._pending += 1
+        self._idle.clear()
+        key = update_chat_key(update)
+        chat = self._chats.get(key)
+        if chat is not None:
+            chat.append(update)
+            return True
+        self._chats[key] = deque([update])
+        task = asyncio.create_task(self._drain(key))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return True
+
+    def pending(self) -> int:
+        return self._pending
+
+    async def _drain(self, key):
+        chat = self._chats[key]
+        try:
+            while chat:
+                # Апдейт остаётся в очереди до конца обработки: новые апдейты чата встают за ним
+                update = chat[0]
+                async with self._semaphore:
+                    try: await self.dispatcher.feed_update(self.bot, update)
+                    except Exception: logging.exception(f"Failed to process update {update.update_id}")
+                chat.popleft()
+                self._pending -= 1
+        finally:
+            self._pending -= len(chat)
+            del self._chats[key]
+            if not self._chats: self._idle.set()
+
+    async def start(self):
+        self._accepting = True
+
+    async def stop(self, drain: bool = True):
+        self._accepting = False
+        if drain: await self._idle.wait()
+        tasks = list(self._tasks)
+        for task in tasks: task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+def create_webhook_app(bot: Bot, pipeline: UpdatePipeline, path: str = "/webhook", secret: str = None) -> web.Application:
+    async def handle_update(request: web.Request):
+        if secret and request.headers.get("X-Telegram-Bot-Api-Secret-Token") != secret:
+            return web.Response(status=401)
+        update = Update.model_validate(await request.json(), context={"bot": bot})
+        if not pipeline.submit(update):
+            return web.Response(status=503, headers={"Retry-After": "1"})
+        return web.Response()
+
+    async def health(request: web.Request):
+        return web.json_response({"ok": True, "pending": pipeline.pending()})
+
+    async def metrics(request: web.Request):
+        BOT_UPDATES_PENDING.set(pipeline.pending())
+        return await metrics_view(request)
+
+    app = web.Application()
+    app.router.add_post(path, handle_update)
+    app.router.add_get("/healthz", health)
+    app.router.add_get("/metrics", metrics)
+    return app
@@ -0,0 +1,183 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import AnswerCallbackQuery, EditMessageText
+
+from botcore.metrics import BOT_SEND_WAIT_SECONDS
+
+# Меньше — раньше: ответ на нажатие кнопки важнее правки сообщения, правка важнее новой отправки.
+PRIORITY_ANSWER, PRIORITY_EDIT, PRIORITY_SEND = 0, 1, 2
+THROTTLED_PREFIXES = ("send", "edit", "copy", "forward")
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self) -> float:
+        """Сколько ждать до появления токена (0 — токен есть)."""
+        self._refill()
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self):
+        self._refill()
+        self.tokens -= 1
+
+    def is_full(self) -> bool:
+        self._refill()
+        return self.tokens >= self.capacity
+
+class PriorityGate:
+    """Общий лимит бота: токены раздаются ожидающим строго по приоритету, затем по очереди прихода.
+
+    Раздачей занимается одна задача, которая живёт, пока есть ожидающие.
+    """
+
+    def __init__(self, bucket: TokenBucket):
+        self.bucket = bucket
+        self.paused_until = 0.0
+        self._waiters = []
+        self._order = itertools.count()
+        self._pump = None
+
+    def pause(self, seconds: float):
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+    async def acquire(self, priority: int):
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._order), future))
+        if self._pump is None or self._pump.done(): self._pump = asyncio.create_task(self._run())
+        await future
+
+    async def _run(self):
+        while self._waiters:
+            delay = max(self.paused_until - time.monotonic(), self.bucket.delay())
+            if delay > 0:
+                await asyncio.sleep(delay)
+                continue
+            _, _, future = heapq.heappop(self._waiters)
+            if future.cancelled(): continue
+            self.bucket.take()
+            future.set_result(None)
+
+class _ChatLimit:
+    __slots__ = ("bucket", "lock")
+
+    def __init__(self, bucket: TokenBucket):
+        self.bucket = bucket
+        self.lock = asyncio.Lock()
+
+class _PendingEdit:
+    __slots__ = ("method", "followers")
+
+    def __init__(self, method: EditMessageText):
+        self.method = method
+        self.followers = []
+
+class OutboundScheduler(BaseRequestMiddleware):
+    """Middleware сессии aiogram: планировщик исходящих вызовов Bot API.
+
+    - общий лимит на бота (`rate` в секунду) и лимит на чат (`chat_rate`, для групп — `group_rate`);
+    - ответы на callback-запросы проходят вне очереди чата и первыми получают общий токен;
+    - на TelegramRetryAfter вся отправка ставится на паузу, вызов повторяется до `max_retries` раз;
+    - несколько ещё не отправленных edit_text одного сообщения сливаются в один — уходит последний текст.
+
+    Вызовы, не отправляющие сообщений (getFile, getUpdates, setWebhook…), проходят без ограничений.
+    Подключается через `bot.session.middleware(OutboundScheduler())`.
+    """
+
+    def __init__(self, rate: float = 30, chat_rate: float = 1, group_rate: float = 20 / 60, chat_burst: float = 2, max_retries: int = 3, max_chats: int = 10000):
+        # Общий бакет без запаса: вызовы идут равномерно, и в любом окне в секунду их не больше rate
+        self.gate = PriorityGate(TokenBucket(rate, 1))
+        self.chat_rate = chat_rate
+        self.group_rate = group_rate
+        self.chat_burst = chat_burst
+        self.max_retries = max_retries
+        self.max_chats = max_chats
+        self._chats = {}
+        self._pending_edits = {}
+        self.coalesced = 0
+
+    def _chat(self, chat_id) -> _ChatLimit:
+        chat = self._chats.get(chat_id)
+        if chat is None:
+            if len(self._chats) >= self.max_chats: self._prune()
+            # Строковый chat_id (@channel) и отрицательные id — группы и каналы с более строгим лимитом
+            rate = self.group_rate if isinstance(chat_id, str) or chat_id < 0 else self.chat_rate
+            chat = self._chats[chat_id] = _ChatLimit(TokenBucket(rate, self.chat_burst))
+        return chat
+
+    def _prune(self):
+        for chat_id, chat in list(self._chats.items()):
+            if not chat.lock.locked() and chat.bucket.is_full(): del self._chats[chat_id]
+
+    async def _acquire(self, chat_id, priority: int):
+        started = time.perf_counter()
+        if chat_id is None or priority == PRIORITY_ANSWER:
+            await self.gate.acquire(priority)
+        else:
+            chat = self._chat(chat_id)
+            # Замок держится до получения общего токена, чтобы сообщения чата уходили по порядку
+            async with chat.lock:
+                delay = chat.bucket.delay()
+                if delay > 0: await asyncio.sleep(delay)
+                chat.bucket.take()
+                await self.gate.acquire(priority)
+        BOT_SEND_WAIT_SECONDS.observe(time.perf_counter() - started, priority=priority)
+
+    async def _send(self, make_request, bot, method, chat_id, priority: int, acquired: bool = False):
+        for attempt in range(self.max_retries + 1):
+            if not acquired: await self._acquire(chat_id, priority)
+            acquired = False
+            try:
+                return await make_request(bot, method)
+            except TelegramRetryAfter as e:
+                if attempt == self.max_retries: raise
+                logging.warning(f"Telegram flood control on {method.__api_method__}: retry after {e.retry_after}s")
+                self.gate.pause(e.retry_after)
+
+    async def __call__(self, make_request, bot, method):
+        if isinstance(method, AnswerCallbackQuery):
+            return await self._send(make_request, bot, method, None, PRIORITY_ANSWER)
+        if not method.__api_method__.startswith(THROTTLED_PREFIXES):
+            return await make_request(bot, method)
+        chat_id = getattr(method, "chat_id", None)
+        if not isinstance(method, EditMessageText):
+            priority = PRIORITY_EDIT if method.__api_method__.startswith("edit") else PRIORITY_SEND
+            return await self._send(make_request, bot, method, chat_id, priority)
+
+        key = (chat_id, method.message_id, method.inline_message_id)
+        pending = self._pending_edits.get(key)
+        if pending is not None:
+            # Правка ещё стоит в очереди: подменяем её текст и ждём общий результат
+            pending.method = method
+            follower = asyncio.get_running_loop().create_future()
+            pending.followers.append(follower)
+            self.coalesced += 1
+            return await follower
+        pending = self._pending_edits[key] = _PendingEdit(method)
+        try:
+            try: await self._acquire(chat_id, PRIORITY_EDIT)
+            # Токен получен (или ожидание прервано) — новые правки этого сообщения встают в очередь отдельно
+            finally: del self._pending_edits[key]
+            result = await self._send(make_request, bot, pending.method, chat_id, PRIORITY_EDIT, acquired=True)
+        except BaseException as e:
+            for follower in pending.followers:
+                if follower.done(): continue
+                if isinstance(e, asyncio.CancelledError): follower.cancel()
+                else: follower.set_exception(e)
+            raise
+        for follower in pending.followers:
+            if not follower.done(): follower.set_result(result)
+        return result
@@ -0,0 +1,78 @@
+import asyncio
+import json
+import logging
+from datetime import datetime, timedelta, timezone
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, DefaultKeyBuilder, StorageKey
+from sqlalchemy import case, delete, select
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from app import models
+from botcore.storage import dumps
+
+UPSERTS = {"postgresql": postgresql_insert, "sqlite": sqlite_insert}
+
+class SQLStorage(BaseStorage):
+    """FSM-хранилище aiogram в общей БД проекта (таблица fsm_states).
+
+    Состояние и данные одного ключа лежат в одной строке. Каждая запись продлевает срок жизни
+    на `ttl`; брошенные сценарии перестают читаться по истечении срока и удаляются `purge_expired`.
+    """
+
+    def __init__(self, session_factory, ttl: timedelta = timedelta(days=1)):
+        self.session_factory = session_factory
+        self.ttl = ttl
+        self.key_builder = DefaultKeyBuilder(with_destiny=True)
+
+    async def _read(self, key: StorageKey):
+        async with self.session_factory() as db:
+            query = select(models.FsmState.state, models.FsmState.data).where(
+                models.FsmState.key == self.key_builder.build(key),
+                models.FsmState.expires_at > datetime.now(timezone.utc),
+            )
+            return (await db.execute(query)).first()
+
+    async def _write(self, key: StorageKey, **values):
+        async with self.session_factory() as db:
+            insert = UPSERTS[db.bind.dialect.name]
+            row_key = self.key_builder.build(key)
+            now = datetime.now(timezone.utc)
+            values["expires_at"] = now + self.ttl
+            statement = insert(models.FsmState).values(key=row_key, **values)
+            # Истёкшая строка не оживает: вторая колонка (state или data) брошенного сценария сбрасывается
+            expired = models.FsmState.expires_at <= now
+            kept = {name: case((expired, None), else_=getattr(models.FsmState, name)) for name in ("state", "data") if name not in values}
+            await db.execute(statement.on_conflict_do_update(index_elements=[models.FsmState.key], set_={**values, **kept}))
+            # Пустые строки (после state.clear()) не храним.
+            await db.execute(delete(models.FsmState).where(models.FsmState.key == row_key, models.FsmState.state.is_(None), models.FsmState.data.is_(None)))
+            await db.commit()
+
+    async def set_state(self, key: StorageKey, state=None):
+        await self._write(key, state=state.state if isinstance(state, State) else state)
+
+    async def get_state(self, key: StorageKey):
+        row = await self._read(key)
+        return row.state if row else None
+
+    async def set_data(self, key: StorageKey, data):
+        await self._write(key, data=dumps(data) if data else None)
+
+    async def get_data(self, key: StorageKey):
+        row = await self._read(key)
+        return json.loads(row.data) if row and row.data else {}
+
+    async def purge_expired(self):
+        async with self.session_factory() as db:
+            result = await db.execute(delete(models.FsmState).where(models.FsmState.expires_at <= datetime.now(timezone.utc)))
+            await db.commit()
+            return result.rowcount
+
+    async def run_purger(self, interval: float = 600):
+        while True:
+            await asyncio.sleep(interval)
+            try: await self.purge_expired()
+            except Exception: logging.exception("Failed to purge expired FSM states")
+
+    async def close(self):
+        pass
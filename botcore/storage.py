@@ -0,0 +1,19 @@
+import json
+from datetime import timedelta
+
+def dumps(data) -> str:
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+
+def create_storage(spec: str, ttl: timedelta):
+    """memory (по умолчанию) | db — общая БД проекта | redis://... — Redis-совместимое хранилище."""
+    if spec.startswith(("redis://", "rediss://")):
+        from aiogram.fsm.storage.base import DefaultKeyBuilder
+        from aiogram.fsm.storage.redis import RedisStorage
+        # with_destiny: данные альбомов (destiny album:…) не должны совпадать с ключом сценария пользователя
+        return RedisStorage.from_url(spec, state_ttl=ttl, data_ttl=ttl, json_dumps=dumps, key_builder=DefaultKeyBuilder(with_destiny=True))
+    if spec == "db":
+        from app.database import AsyncSessionLocal
+        from botcore.sql_storage import SQLStorage
+        return SQLStorage(AsyncSessionLocal, ttl=ttl)
+    from aiogram.fsm.storage.memory import MemoryStorage
+    return MemoryStorage()
@@ -0,0 +1,30 @@
+from logging.config import fileConfig
+from alembic import context
+
+from app import models
+from app.database import engine
+
+if context.config.config_file_name is not None:
+    fileConfig(context.config.config_file_name)
+
+target_metadata = models.Base.metadata
+
+def include_object(obj, name, type_, reflected, compare_to):
+    # FTS5-таблица поиска в SQLite и её служебные таблицы создаются миграцией вручную.
+    return not (type_ == "table" and name.startswith("items_fts"))
+
+def run_migrations_offline():
+    context.configure(url=engine.url, target_metadata=target_metadata, include_object=include_object, literal_binds=True)
+    with context.begin_transaction():
+        context.run_migrations()
+
+def run_migrations_online():
+    with engine.connect() as connection:
+        context.configure(connection=connection, target_metadata=target_metadata, include_object=include_object, render_as_batch=connection.dialect.name == "sqlite")
+        with context.begin_transaction():
+            context.run_migrations()
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
@@ -0,0 +1,53 @@
+"""Исходная схема: users, boards, items
+
+Базы, созданные раньше через create_all, отмечаются этой ревизией командой `alembic stamp 0001`.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "users",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("telegram_id", sa.BigInteger(), nullable=False),
+        sa.Column("username", sa.String(), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+    op.create_index("ix_users_id", "users", ["id"])
+    op.create_index("ix_users_telegram_id", "users", ["telegram_id"], unique=True)
+    op.create_table(
+        "boards",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("name", sa.String()),
+        sa.Column("emoji_icon", sa.String(), nullable=True),
+        sa.Column("owner_id", sa.Integer(), sa.ForeignKey("users.id")),
+    )
+    op.create_index("ix_boards_id", "boards", ["id"])
+    op.create_index("ix_boards_name", "boards", ["name"])
+    op.create_table(
+        "items",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("item_type", sa.String(50), nullable=False),
+        sa.Column("title", sa.String()),
+        sa.Column("content", sa.String()),
+        sa.Column("owner_id", sa.Integer(), sa.ForeignKey("users.id")),
+        sa.Column("board_id", sa.Integer(), sa.ForeignKey("boards.id"), nullable=True),
+    )
+    op.create_index("ix_items_id", "items", ["id"])
+    op.create_index("ix_items_title", "items", ["title"])
+
+
+def downgrade():
+    op.drop_table("items")
+    op.drop_table("boards")
+    op.drop_table("users")
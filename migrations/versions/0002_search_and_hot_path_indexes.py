@@ -0,0 +1,67 @@
+"""Полнотекстовый поиск и составные индексы для выборок по владельцу и доске
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+HOT_PATH_INDEXES = [
+    ("ix_boards_owner_id", "boards", ["owner_id"]),
+    ("ix_items_owner_id_board_id", "items", ["owner_id", "board_id"]),
+    ("ix_items_board_id_id", "items", ["board_id", "id"]),
+]
+
+SEARCH_DOCUMENT = "to_tsvector('simple'::regconfig, (coalesce(title, '') || ' ') || coalesce(CASE WHEN (item_type = 'text') THEN content ELSE '' END, ''))"
+
+SQLITE_FTS_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS items_fts USING fts5(title, content, tokenize='unicode61 remove_diacritics 2')",
+    """CREATE TRIGGER IF NOT EXISTS items_fts_insert AFTER INSERT ON items BEGIN
+        INSERT INTO items_fts(rowid, title, content) VALUES (new.id, new.title, CASE WHEN new.item_type = 'text' THEN new.content ELSE '' END);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS items_fts_update AFTER UPDATE OF title, content, item_type ON items BEGIN
+        DELETE FROM items_fts WHERE rowid = old.id;
+        INSERT INTO items_fts(rowid, title, content) VALUES (new.id, new.title, CASE WHEN new.item_type = 'text' THEN new.content ELSE '' END);
+    END""",
+    "CREATE TRIGGER IF NOT EXISTS items_fts_delete AFTER DELETE ON items BEGIN DELETE FROM items_fts WHERE rowid = old.id; END",
+    "INSERT INTO items_fts(rowid, title, content) SELECT id, title, CASE WHEN item_type = 'text' THEN content ELSE '' END FROM items",
+]
+
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == "postgresql":
+        # CONCURRENTLY строит индекс без блокировки записи в items, но только вне транзакции.
+        # Если построение прервалось, остаётся INVALID-индекс: удалите его и повторите миграцию.
+        with op.get_context().autocommit_block():
+            for name, table, columns in HOT_PATH_INDEXES:
+                op.create_index(name, table, columns, postgresql_concurrently=True)
+            op.execute(f"CREATE INDEX CONCURRENTLY ix_items_search_document ON items USING gin ({SEARCH_DOCUMENT})")
+        return
+    for name, table, columns in HOT_PATH_INDEXES:
+        op.create_index(name, table, columns)
+    if dialect == "sqlite":
+        for statement in SQLITE_FTS_DDL:
+            op.execute(statement)
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == "postgresql":
+        with op.get_context().autocommit_block():
+            op.drop_index("ix_items_search_document", table_name="items", postgresql_concurrently=True)
+            for name, table, _ in reversed(HOT_PATH_INDEXES):
+                op.drop_index(name, table_name=table, postgresql_concurrently=True)
+        return
+    if dialect == "sqlite":
+        for trigger in ("items_fts_insert", "items_fts_update", "items_fts_delete"):
+            op.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+        op.execute("DROP TABLE IF EXISTS items_fts")
+    for name, table, _ in reversed(HOT_PATH_INDEXES):
+        op.drop_index(name, table_name=table)
@@ -0,0 +1,25 @@
+"""Счётчики версий для ETag: users.boards_version, boards.version
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column("users", sa.Column("boards_version", sa.Integer(), nullable=False, server_default="0"))
+    op.add_column("boards", sa.Column("version", sa.Integer(), nullable=False, server_default="0"))
+
+
+def downgrade():
+    with op.batch_alter_table("boards") as batch:
+        batch.drop_column("version")
+    with op.batch_alter_table("users") as batch:
+        batch.drop_column("boards_version")
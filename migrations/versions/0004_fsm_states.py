@@ -0,0 +1,28 @@
+"""Таблица fsm_states для общего хранилища состояний бота
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "fsm_states",
+        sa.Column("key", sa.String(), primary_key=True),
+        sa.Column("state", sa.String(), nullable=True),
+        sa.Column("data", sa.Text(), nullable=True),
+        sa.Column("expires_at", sa.DateTime(timezone=True), nullable=False),
+    )
+    op.create_index("ix_fsm_states_expires_at", "fsm_states", ["expires_at"])
+
+
+def downgrade():
+    op.drop_table("fsm_states")
@@ -0,0 +1,70 @@
+"""Таблица media с ключом file_unique_id и ссылка на неё из items
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18
+
+Уже сохранённые элементы остаются без media_id: file_unique_id из file_id не восстановить.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+SQLITE_FTS_TRIGGERS = [
+    """CREATE TRIGGER IF NOT EXISTS items_fts_insert AFTER INSERT ON items BEGIN
+        INSERT INTO items_fts(rowid, title, content) VALUES (new.id, new.title, CASE WHEN new.item_type = 'text' THEN new.content ELSE '' END);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS items_fts_update AFTER UPDATE OF title, content, item_type ON items BEGIN
+        DELETE FROM items_fts WHERE rowid = old.id;
+        INSERT INTO items_fts(rowid, title, content) VALUES (new.id, new.title, CASE WHEN new.item_type = 'text' THEN new.content ELSE '' END);
+    END""",
+    "CREATE TRIGGER IF NOT EXISTS items_fts_delete AFTER DELETE ON items BEGIN DELETE FROM items_fts WHERE rowid = old.id; END",
+]
+
+
+def upgrade():
+    op.create_table(
+        "media",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("file_unique_id", sa.String(), nullable=False, unique=True),
+        sa.Column("media_type", sa.String(length=50), nullable=False),
+        sa.Column("file_id", sa.String(), nullable=False),
+        sa.Column("file_size", sa.BigInteger(), nullable=True),
+        sa.Column("duration", sa.Integer(), nullable=True),
+        sa.Column("mime_type", sa.String(), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+    if op.get_bind().dialect.name == "sqlite":
+        # batch-режим пересоздал бы items и потерял триггеры FTS; ADD COLUMN с REFERENCES SQLite умеет сам
+        op.execute("ALTER TABLE items ADD COLUMN media_id INTEGER REFERENCES media (id)")
+    else:
+        op.add_column("items", sa.Column("media_id", sa.Integer(), nullable=True))
+        op.create_foreign_key("items_media_id_fkey", "items", "media", ["media_id"], ["id"])
+    if op.get_bind().dialect.name == "postgresql":
+        # Как в 0002: CONCURRENTLY не блокирует запись в items на время построения
+        with op.get_context().autocommit_block():
+            op.create_index("ix_items_owner_id_media_id", "items", ["owner_id", "media_id"], postgresql_concurrently=True)
+    else:
+        op.create_index("ix_items_owner_id_media_id", "items", ["owner_id", "media_id"])
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == "postgresql":
+        with op.get_context().autocommit_block():
+            op.drop_index("ix_items_owner_id_media_id", table_name="items", postgresql_concurrently=True)
+    else:
+        op.drop_index("ix_items_owner_id_media_id", table_name="items")
+    if dialect == "sqlite":
+        with op.batch_alter_table("items") as batch:
+            batch.drop_column("media_id")
+        for statement in SQLITE_FTS_TRIGGERS:
+            op.execute(statement)
+    else:
+        op.drop_constraint("items_media_id_fkey", "items", type_="foreignkey")
+        op.drop_column("items", "media_id")
+    op.drop_table("media")
@@ -0,0 +1,26 @@
+"""AUTOINCREMENT для boards в SQLite: id удалённых досок не переиспользуются
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-18
+
+В PostgreSQL последовательность и так не выдаёт id повторно — миграция там ничего не делает.
+"""
+from alembic import op
+
+revision = "0007"
+down_revision = "0006"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if op.get_bind().dialect.name != "sqlite": return
+    with op.batch_alter_table("boards", recreate="always", table_kwargs={"sqlite_autoincrement": True}):
+        pass
+
+
+def downgrade():
+    if op.get_bind().dialect.name != "sqlite": return
+    with op.batch_alter_table("boards", recreate="always", table_kwargs={"sqlite_autoincrement": False}):
+        pass